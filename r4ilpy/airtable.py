@@ -1,26 +1,244 @@
-from datetime import datetime, timedelta, timezone
-from functools import cached_property
+from array import array
+import asyncio
+from bisect import bisect_left, bisect_right
+from datetime import datetime, time, timedelta, timezone
+from functools import cached_property, lru_cache
+import heapq
+import json
+import os
 from r4ilpy.settings import (
     AIRTABLE_API_KEY,
     AIRTABLE_BASE_ID,
     AIRTABLE_CALENDAR_VIEW_NAME,
+    AIRTABLE_ENDPOINT_URL,
     AIRTABLE_EVENTS_TABLE_ID,
+    AIRTABLE_LAST_MODIFIED_FIELD,
+    AIRTABLE_POOL_SIZE,
+    AIRTABLE_REQUESTS_PER_SECOND,
+    AIRTABLE_SNAPSHOT_PATH,
+    AIRTABLE_USERS_TABLE_ID,
 )
+from r4ilpy.rate_limits import GovernedHTTPAdapter, RateLimitGovernor
 from pyairtable import Api as AirtableAPI
 
+# Airtable allows about 5 requests per second per base; all connectors share
+# this governor so concurrent fetches stay under that together
+AIRTABLE_GOVERNOR = RateLimitGovernor(rate=AIRTABLE_REQUESTS_PER_SECOND)
+
+
+@lru_cache
+def get_airtable_api(
+    api_key, endpoint_url=AIRTABLE_ENDPOINT_URL, governor=AIRTABLE_GOVERNOR
+):
+    """
+    Shared Api per key and endpoint, so every connector reuses one pooled HTTP
+    session. Requests go through `governor`, which also retries 429s.
+    """
+    api = AirtableAPI(api_key, endpoint_url=endpoint_url, retry_strategy=None)
+    adapter = GovernedHTTPAdapter(
+        governor,
+        pool_connections=AIRTABLE_POOL_SIZE,
+        pool_maxsize=AIRTABLE_POOL_SIZE,
+    )
+    api.session.mount("https://", adapter)
+    api.session.mount("http://", adapter)
+    return api
+
+
+def airtable_datetime(value):
+    """
+    Format an aware datetime as a UTC timestamp for use in Airtable formulas
+    """
+    value = value.astimezone(timezone.utc)
+    return f"DATETIME_PARSE('{value.strftime('%Y-%m-%dT%H:%M:%S.000Z')}')"
+
+
+def start_of_day(start_time):
+    """
+    Midnight UTC on `start_time`'s calendar date. Airtable's "Start" is in
+    UTC, so records starting from then are the ones whose start date is on or
+    after that date.
+    """
+    return datetime.combine(start_time.date(), time(), timezone.utc)
+
+
+class AirtableSnapshot:
+    """
+    Local copy of a table's records, stored as JSON between runs
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.key = None
+        self.synced_at = None
+        self.records = []
+
+    def load(self):
+        """Read the snapshot, leaving it empty if it's missing or malformed"""
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            synced_at = datetime.fromisoformat(data["synced_at"])
+            records = data.get("records", [])
+            if not isinstance(records, list):
+                raise ValueError("records is not a list")
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return self
+        self.key = data.get("key")
+        self.synced_at = synced_at
+        self.records = records
+        return self
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(
+                {
+                    "key": self.key,
+                    "synced_at": self.synced_at.isoformat(),
+                    "records": self.records,
+                },
+                f,
+            )
+        os.replace(tmp_path, self.path)
+
+    def merge(self, changed_records, live_ids):
+        """
+        Apply changed records and drop any record whose id is no longer live.
+        The merged records follow the order of `live_ids`.
+        """
+        records_by_id = {record["id"]: record for record in self.records}
+        records_by_id.update((record["id"], record) for record in changed_records)
+        self.records = [
+            records_by_id[record_id]
+            for record_id in live_ids
+            if record_id in records_by_id
+        ]
+
 
 class AirtableConnector:
     api_key: str
     base_id: str
     table_id: str
     options: dict[str | str]
+    endpoint_url: str = AIRTABLE_ENDPOINT_URL
+    governor: RateLimitGovernor = AIRTABLE_GOVERNOR
+    snapshot_path: str | None = None
+    last_modified_field: str = AIRTABLE_LAST_MODIFIED_FIELD
+    # Re-fetch records modified slightly before the last sync, in case they
+    # were edited while that sync was running
+    sync_overlap = timedelta(minutes=1)
+    # Whether the records come back ordered by their "Start" field
+    sorted_by_start: bool = False
+    # Records fetched by id per request, to keep the formula short
+    ids_per_request = 50
 
     def fetchall(self):
+        if self.snapshot_path:
+            return self.sync()
         return self._table.all(**self.options)
 
+    def iterate(self):
+        """
+        Yield pages of records as they arrive. With a snapshot, the synced
+        snapshot is yielded as a single page.
+        """
+        if self.snapshot_path:
+            yield self.sync()
+        else:
+            yield from self._table.iterate(**self.options)
+
+    def sync(self):
+        """
+        Bring the local snapshot up to date and return its records.
+
+        Only records modified since the last sync are downloaded in full. The
+        rest of the view is listed with just the last-modified field so deleted
+        records can be dropped from the snapshot, and records that newly
+        belong to the view (e.g. after the formula's date cutoff moved) are
+        fetched by id.
+        """
+        snapshot = AirtableSnapshot(self.snapshot_path).load()
+        synced_at = datetime.now(timezone.utc)
+        if snapshot.synced_at is None or snapshot.key != self._snapshot_key:
+            snapshot.records = self._table.all(**self.options)
+        else:
+            changed_records = self._table.all(
+                **self._changed_since_options(snapshot.synced_at - self.sync_overlap)
+            )
+            live_ids = [record["id"] for record in self._table.all(**self._ids_options)]
+            known_ids = {record["id"] for record in snapshot.records}
+            known_ids.update(record["id"] for record in changed_records)
+            missing_ids = [
+                record_id for record_id in live_ids if record_id not in known_ids
+            ]
+            changed_records += self._fetch_by_ids(missing_ids)
+            snapshot.merge(changed_records, live_ids)
+        snapshot.key = self._snapshot_key
+        snapshot.synced_at = synced_at
+        snapshot.save()
+        return snapshot.records
+
+    @property
+    def _snapshot_key(self):
+        # The formula is left out of the key because it may change from run to
+        # run (e.g. a moving date cutoff); the ids listing drops records it
+        # now excludes and picks up ones it now includes
+        options = {
+            name: value for name, value in self.options.items() if name != "formula"
+        }
+        return json.dumps(
+            [self.base_id, self.table_id, options], sort_keys=True, default=str
+        )
+
+    def _changed_since_options(self, since):
+        changed_formula = (
+            f"IS_AFTER({{{self.last_modified_field}}}, {airtable_datetime(since)})"
+        )
+        formula = self.options.get("formula")
+        if formula:
+            changed_formula = f"AND({formula}, {changed_formula})"
+        return {**self.options, "formula": changed_formula}
+
+    def _fetch_by_ids(self, record_ids):
+        records = []
+        for start in range(0, len(record_ids), self.ids_per_request):
+            chunk = record_ids[start : start + self.ids_per_request]
+            formula = "OR({})".format(
+                ", ".join(f"RECORD_ID() = '{record_id}'" for record_id in chunk)
+            )
+            records += self._table.all(**{**self.options, "formula": formula})
+        return records
+
+    @property
+    def _ids_options(self):
+        return {**self.options, "fields": [self.last_modified_field]}
+
+    async def aiterate(self):
+        """
+        Async version of `iterate`. Pages are fetched in a worker thread, and
+        the next page is requested while the caller processes the current one.
+        """
+        pages = self.iterate()
+        next_page = asyncio.ensure_future(asyncio.to_thread(next, pages, None))
+        try:
+            while (page := await next_page) is not None:
+                next_page = asyncio.ensure_future(asyncio.to_thread(next, pages, None))
+                yield page
+        finally:
+            # A page may still be loading if the caller stopped early
+            await asyncio.wait({next_page})
+            pages.close()
+
+    async def afetchall(self):
+        return [record async for page in self.aiterate() for record in page]
+
     @cached_property
     def _api(self):
-        return AirtableAPI(self.api_key)
+        return get_airtable_api(self.api_key, self.endpoint_url, self.governor)
 
     @cached_property
     def _table(self):
@@ -31,7 +249,119 @@ class AirtableCalendarViewConnector(AirtableConnector):
     api_key: str = AIRTABLE_API_KEY
     base_id: str = AIRTABLE_BASE_ID
     table_id: str = AIRTABLE_EVENTS_TABLE_ID
-    options: dict[str | str] = {"view": AIRTABLE_CALENDAR_VIEW_NAME}
+    view: str = AIRTABLE_CALENDAR_VIEW_NAME
+    snapshot_path: str | None = AIRTABLE_SNAPSHOT_PATH
+    sorted_by_start: bool = True
+    # Only the fields read by AirtableRecordsFilterer and airtable_record_to_event
+    fields = [
+        "Title",
+        "Start",
+        "Date",
+        "Start Time",
+        "Location",
+        "Recurring Event ID",
+    ]
+
+    def __init__(self, start_time=None):
+        self.start_time = start_time
+
+    @property
+    def options(self):
+        return {
+            "view": self.view,
+            "fields": self.fields,
+            "formula": self.upcoming_events_formula,
+            "sort": ["Start"],
+        }
+
+    @property
+    def upcoming_events_formula(self):
+        """
+        Server-side version of AirtableRecordsFilterer's upcoming events rule:
+        keep events starting on or after the start of the current day
+        """
+        start_time = self.start_time or datetime.now(timezone.utc)
+        return (
+            f"NOT(IS_BEFORE({{Start}}, {airtable_datetime(start_of_day(start_time))}))"
+        )
+
+
+class AirtableEventIndex:
+    """
+    Records sorted by start time, with start times parsed once into a compact
+    array of timestamps so window queries can use binary search.
+
+    Airtable returns "Start" in UTC, so comparing timestamps gives the same
+    results as comparing dates and datetimes.
+    """
+
+    def __init__(self, records):
+        starts = [
+            datetime.fromisoformat(record["fields"]["Start"]).timestamp()
+            for record in records
+        ]
+        order = sorted(range(len(records)), key=starts.__getitem__)
+        self.records = [records[i] for i in order]
+        self.starts = array("d", (starts[i] for i in order))
+        self.previous_in_series = array("q", self._previous_in_series(self.records))
+
+    @staticmethod
+    def _previous_in_series(records):
+        """
+        For each record, the position of the previous instance of the same
+        recurring event, or -1
+        """
+        last_seen = {}
+        for position, record in enumerate(records):
+            recurring_event_id = record["fields"].get("Recurring Event ID")
+            if recurring_event_id:
+                yield last_seen.get(recurring_event_id, -1)
+                last_seen[recurring_event_id] = position
+            else:
+                yield -1
+
+    def __len__(self):
+        return len(self.records)
+
+    def position(self, moment):
+        """Position of the first record starting at or after `moment`"""
+        return bisect_left(self.starts, moment.timestamp())
+
+    def upcoming(self, start, until=None, limit=None):
+        """
+        Records starting at or after `start` (and no later than `until`), in
+        start order, keeping only the earliest instance of each recurring event.
+        """
+        first = self.position(start)
+        stop = len(self.starts)
+        if until is not None:
+            stop = bisect_right(self.starts, until.timestamp(), lo=first)
+        records = []
+        for position in range(first, stop):
+            if self.previous_in_series[position] < first:
+                records.append(self.records[position])
+                if limit is not None and len(records) >= limit:
+                    break
+        return records
+
+
+class AirtableUsersConnector(AirtableConnector):
+    api_key: str = AIRTABLE_API_KEY
+    base_id: str = AIRTABLE_BASE_ID
+    table_id: str = AIRTABLE_USERS_TABLE_ID
+    options: dict[str | str] = {}
+
+
+async def afetch_concurrently(*connectors):
+    return await asyncio.gather(*(connector.afetchall() for connector in connectors))
+
+
+def fetch_concurrently(*connectors):
+    """
+    Fetch several views or tables at once, e.g.
+    `fetch_concurrently(AirtableCalendarViewConnector(), AirtableUsersConnector())`
+    """
+    return asyncio.run(afetch_concurrently(*connectors))
 
 
 class AirtableRecordsFilterer:
@@ -40,48 +370,107 @@ class AirtableRecordsFilterer:
         self.cutoff_days = cutoff_days
         self.min_events = min_events
 
+    @cached_property
+    def index(self):
+        return AirtableEventIndex(self.records)
+
     def filter(self, start_time=None):
         self.start_time = start_time or datetime.now(timezone.utc)
-        records = sorted(
-            filter(self._is_future_event, self.records),
-            key=self._sort_by_start_date,
-        )
-        records = self._filter_out_recurring_events(records)
-        events_before_cutoff = self._get_events_before_cutoff(records, self.cutoff_days)
+        first_start = start_of_day(self.start_time)
+        end_date = self.start_time + timedelta(days=self.cutoff_days)
+        events_before_cutoff = self.index.upcoming(first_start, until=end_date)
         if len(events_before_cutoff) >= self.min_events:
             return events_before_cutoff
         else:
-            return records[: self.min_events + 1]
+            return self.index.upcoming(first_start, limit=self.min_events + 1)
 
-    def _get_events_before_cutoff(self, records, days):
-        end_date = self.start_time + timedelta(days=days)
-        return [
-            record
-            for record in records
-            if datetime.fromisoformat(record["fields"]["Start"]) <= end_date
-        ]
 
-    def _is_future_event(self, record):
-        start = datetime.fromisoformat(record["fields"]["Start"])
-        start_date_only = start.date()
-        current_date_only = self.start_time.date()
-        return start_date_only >= current_date_only
+class AirtableStreamingFilterer:
+    """
+    Filter pages of records as they arrive, returning the same records as
+    AirtableRecordsFilterer without holding the whole view in memory.
+
+    If the pages are sorted by start, fetching stops as soon as the cutoff
+    window and the `min_events + 1` fallback are both covered. Otherwise only
+    records that can still end up in the result are kept: everything in the
+    window, the earliest instance of each recurring event, and a bounded heap
+    of the earliest remaining records.
+    """
+
+    def __init__(self, pages, cutoff_days=10, min_events=10, sorted_by_start=False):
+        self.pages = pages
+        self.cutoff_days = cutoff_days
+        self.min_events = min_events
+        self.sorted_by_start = sorted_by_start
+
+    def filter(self, start_time=None):
+        self.start_time = start_time or datetime.now(timezone.utc)
+        self.start_of_day = start_of_day(self.start_time).timestamp()
+        self.end_date = (self.start_time + timedelta(days=self.cutoff_days)).timestamp()
+        if self.sorted_by_start:
+            records = self._take_sorted()
+        else:
+            records = self._take_candidates()
+        return AirtableRecordsFilterer(
+            records, cutoff_days=self.cutoff_days, min_events=self.min_events
+        ).filter(start_time=self.start_time)
 
-    def _sort_by_start_date(self, record):
-        return datetime.fromisoformat(record["fields"]["Start"])
+    def _upcoming_records(self):
+        for page in self.pages:
+            for record in page:
+                start = datetime.fromisoformat(record["fields"]["Start"]).timestamp()
+                if start >= self.start_of_day:
+                    yield start, record
 
-    def _filter_out_recurring_events(self, records):
+    def _take_sorted(self):
+        fallback_size = self.min_events + 1
         recurring_event_ids = set()
-        filtered_records = []
-        for record in records:
+        distinct_events = 0
+        records = []
+        upcoming_records = self._upcoming_records()
+        for start, record in upcoming_records:
+            if start > self.end_date and distinct_events >= fallback_size:
+                break
+            records.append(record)
             recurring_event_id = record["fields"].get("Recurring Event ID")
             if not recurring_event_id or recurring_event_id not in recurring_event_ids:
-                filtered_records.append(record)
+                distinct_events += 1
                 if recurring_event_id:
                     recurring_event_ids.add(recurring_event_id)
-        return filtered_records
+        upcoming_records.close()
+        return records
+
+    def _take_candidates(self):
+        fallback_size = self.min_events + 1
+        in_window = []
+        first_in_series = {}
+        # Max-heap (by negated start and arrival order) of the earliest records
+        # after the window that aren't part of a recurring event
+        after_window = []
+        for arrival, (start, record) in enumerate(self._upcoming_records()):
+            recurring_event_id = record["fields"].get("Recurring Event ID")
+            if recurring_event_id:
+                first = first_in_series.get(recurring_event_id)
+                if first is None or (start, arrival) < first[:2]:
+                    first_in_series[recurring_event_id] = (start, arrival, record)
+            elif start <= self.end_date:
+                in_window.append((start, arrival, record))
+            elif len(after_window) < fallback_size:
+                heapq.heappush(after_window, (-start, -arrival, record))
+            elif (start, arrival) < (-after_window[0][0], -after_window[0][1]):
+                heapq.heapreplace(after_window, (-start, -arrival, record))
+        candidates = [
+            *in_window,
+            *first_in_series.values(),
+            *((-start, -arrival, record) for start, arrival, record in after_window),
+        ]
+        # Restore arrival order so ties on start sort the same way as a full sort
+        candidates.sort(key=lambda candidate: candidate[1])
+        return [record for _, _, record in candidates]
 
 
 def get_filtered_calendar_records(start_time=None):
-    records = AirtableCalendarViewConnector().fetchall()
-    return AirtableRecordsFilterer(records).filter(start_time=start_time)
+    connector = AirtableCalendarViewConnector(start_time=start_time)
+    return AirtableStreamingFilterer(
+        connector.iterate(), sorted_by_start=connector.sorted_by_start
+    ).filter(start_time=start_time)
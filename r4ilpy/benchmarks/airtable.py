@@ -0,0 +1,196 @@
+"""
+Throughput benchmarks for the Airtable connectors, run against a local
+FakeAirtableServer loaded with synthetic events.
+
+    poetry run python -m r4ilpy.benchmarks.airtable --sizes 1000 10000 100000
+"""
+
+import argparse
+from datetime import datetime, timedelta
+import json
+import time
+from r4ilpy.airtable import (
+    AirtableCalendarViewConnector,
+    AirtableConnector,
+    AirtableStreamingFilterer,
+)
+from r4ilpy.fake_airtable import FakeAirtableServer, synthetic_event_records
+from r4ilpy.rate_limits import RateLimitGovernor
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+TABLE_ID = "tblEvents"
+VIEW_NAME = "Calendar"
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+class TimedPages:
+    """
+    Wraps a page iterator, recording how long each page took to arrive
+    """
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.page_latencies = []
+        self.records = 0
+
+    def __iter__(self):
+        pages = iter(self.pages)
+        while True:
+            started = time.perf_counter()
+            try:
+                page = next(pages)
+            except StopIteration:
+                return
+            self.page_latencies.append(time.perf_counter() - started)
+            self.records += len(page)
+            yield page
+
+
+def summarize(name, size, timed_pages, elapsed, **extra):
+    latencies_ms = [latency * 1000 for latency in timed_pages.page_latencies]
+    return {
+        "scenario": name,
+        "size": size,
+        "records": timed_pages.records,
+        "pages": len(latencies_ms),
+        "seconds": elapsed,
+        "records_per_sec": timed_pages.records / elapsed if elapsed else 0.0,
+        "pages_per_sec": len(latencies_ms) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies_ms, 50),
+        "p90_ms": percentile(latencies_ms, 90),
+        "p99_ms": percentile(latencies_ms, 99),
+        **extra,
+    }
+
+
+def run_scenario(server, governor, name, size, pages, consume=None):
+    requests_before = server.request_count
+    throttled_before = server.throttled_count
+    waits_before = governor.metrics["wait_seconds"]
+    timed_pages = TimedPages(pages)
+    started = time.perf_counter()
+    if consume:
+        result = consume(timed_pages)
+        extra = {"results": len(result)}
+    else:
+        for _ in timed_pages:
+            pass
+        extra = {}
+    elapsed = time.perf_counter() - started
+    extra["requests"] = server.request_count - requests_before
+    extra["throttled"] = server.throttled_count - throttled_before
+    extra["governor_wait_seconds"] = governor.metrics["wait_seconds"] - waits_before
+    return summarize(name, size, timed_pages, elapsed, **extra)
+
+
+def benchmark_size(size, latency=0.0, throttle_rate=0.0, rate=None):
+    records = synthetic_event_records(size)
+    # A day into the synthetic calendar, so some events are already past
+    first_start = min(record["fields"]["Start"] for record in records)
+    start_time = datetime.fromisoformat(first_start) + timedelta(days=1)
+    server = FakeAirtableServer(
+        {TABLE_ID: records},
+        views={VIEW_NAME: {}},
+        latency=latency,
+        throttle_rate=throttle_rate,
+    )
+    # Unlimited by default, to measure the connectors rather than the limit
+    benchmark_governor = RateLimitGovernor(rate=rate, backoff_factor=0.1)
+    with server:
+
+        class BenchmarkConnector(AirtableConnector):
+            api_key = "benchmark"
+            base_id = "appBenchmark"
+            table_id = TABLE_ID
+            endpoint_url = server.url
+            governor = benchmark_governor
+            options = {"view": VIEW_NAME}
+
+        class BenchmarkCalendarViewConnector(AirtableCalendarViewConnector):
+            api_key = "benchmark"
+            base_id = "appBenchmark"
+            table_id = TABLE_ID
+            view = VIEW_NAME
+            endpoint_url = server.url
+            governor = benchmark_governor
+            snapshot_path = None
+
+        results = [
+            run_scenario(
+                server,
+                benchmark_governor,
+                "full view",
+                size,
+                BenchmarkConnector().iterate(),
+            ),
+            run_scenario(
+                server,
+                benchmark_governor,
+                "calendar view",
+                size,
+                BenchmarkCalendarViewConnector(start_time=start_time).iterate(),
+            ),
+        ]
+        calendar_connector = BenchmarkCalendarViewConnector(start_time=start_time)
+        results.append(
+            run_scenario(
+                server,
+                benchmark_governor,
+                "filtered (streaming)",
+                size,
+                calendar_connector.iterate(),
+                consume=lambda pages: AirtableStreamingFilterer(
+                    pages, sorted_by_start=calendar_connector.sorted_by_start
+                ).filter(start_time=start_time),
+            )
+        )
+    return results
+
+
+def print_results(results):
+    header = (
+        f"{'scenario':<22}{'size':>8}{'records':>9}{'pages':>7}"
+        f"{'rec/s':>11}{'pages/s':>9}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}"
+    )
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        print(
+            f"{result['scenario']:<22}{result['size']:>8}{result['records']:>9}"
+            f"{result['pages']:>7}{result['records_per_sec']:>11.0f}"
+            f"{result['pages_per_sec']:>9.1f}{result['p50_ms']:>9.2f}"
+            f"{result['p90_ms']:>9.2f}{result['p99_ms']:>9.2f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--rate", type=float, help="Requests per second allowed by the governor"
+    )
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        results.extend(
+            benchmark_size(size, args.latency, args.throttle_rate, args.rate)
+        )
+    print_results(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+"""
+Rendering benchmarks for the intro and event cards, using a fixed set of
+synthetic events.
+
+    poetry run python -m r4ilpy.benchmarks.rendering --compare latest
+
+Each run is saved under .benchmarks/rendering/ (named by time and commit), and
+--compare prints the change in mean time against an earlier run. Peak memory
+is Python allocations only (tracemalloc); Pillow's image buffers show up in
+max RSS instead.
+
+Stage times are summed over every image rendered, so in the batch scenarios,
+where images encode while the next ones render, they can add up to more than
+the wall time.
+"""
+
+import argparse
+from datetime import date, datetime, time
+import glob
+import json
+import os
+import resource
+import subprocess
+import tempfile
+import time as timer
+import tracemalloc
+from r4ilpy.benchmarks.airtable import percentile
+from r4ilpy.emoji_sources import TwemojiEmojiSource
+from r4ilpy.events import Event
+from r4ilpy.image_generators import EventImageGenerator, IntroImageGenerator
+from r4ilpy.instagram import InstagramPoster, encode_image, render_image, run_now
+from r4ilpy.instrumentation import MemorySink, Tracer
+
+DEFAULT_BATCH_SIZES = (1, 19, 100)
+DEFAULT_RESULTS_DIR = ".benchmarks/rendering"
+POST_TIME = datetime(2024, 11, 20, 9, 0)
+
+# Only emojis from the repo's twemoji set, so nothing is downloaded
+SYNTHETIC_EVENTS = [
+    Event("Rally", date(2024, 11, 21), time(17, 0), "City Hall"),
+    Event(
+        "Chicago (DePaul): Stop the Hate: Rally for Jewish Students, Faculty "
+        "and Staff Against Antisemitism on Campus and Beyond",
+        date(2024, 11, 22),
+        time(12, 30),
+        "DePaul University - Lincoln Park Student Center, 2250 N. Sheffield "
+        "Ave., Chicago, IL 60614",
+    ),
+    Event(
+        "🇮🇱🎗️ Bring Them Home 🎗️🇮🇱 ✡️ Vigil 📌 Rally 🔗 March 👉 🪧",
+        date(2024, 11, 23),
+        time(19, 0),
+        "📌 Main Square 🇮🇱",
+    ),
+    Event("Solidarity Walk (location TBA)", date(2024, 11, 24), time(10, 0), ""),
+    Event("All-Day Advocacy Day", date(2024, 11, 25), None, "State Capitol"),
+]
+
+
+# Every card stage is traced into this sink and added up afterwards
+STAGE_SINK = MemorySink()
+STAGE_TRACER = Tracer(STAGE_SINK)
+STAGE_SPANS = {
+    "card.fonts": "fonts",
+    "card.layout": "layout",
+    "card.compositing": "compositing",
+    "card.text_emoji": "text_emoji",
+    "card.encode": "encode",
+}
+
+
+def stage_times():
+    """Seconds spent in each stage since the last call, from the traced spans"""
+    stages = {}
+    records, STAGE_SINK.records = STAGE_SINK.records, []
+    for record in records:
+        name = STAGE_SPANS.get(record["name"])
+        if name:
+            stages[name] = stages.get(name, 0.0) + record["duration_ms"] / 1000
+    return stages
+
+
+class BenchmarkIntroImageGenerator(IntroImageGenerator):
+    render_cache = None
+    tracer = STAGE_TRACER
+
+
+class BenchmarkEventImageGenerator(EventImageGenerator):
+    render_cache = None
+    tracer = STAGE_TRACER
+
+
+class BenchmarkPoster(InstagramPoster):
+    intro_image_generator_class = BenchmarkIntroImageGenerator
+    event_image_generator_class = BenchmarkEventImageGenerator
+    total_event_batches = 1
+    post_time = POST_TIME
+    ledger_path = None
+    tracer = STAGE_TRACER
+
+    def report_encode_stats(self, batch_number, stats, cached=0):
+        # Would print into the middle of the results table
+        pass
+
+
+def synthetic_events(count):
+    return [SYNTHETIC_EVENTS[i % len(SYNTHETIC_EVENTS)] for i in range(count)]
+
+
+def generate_by_stage(generator):
+    """
+    Render and encode one card the way a post does. Returns the time spent
+    in each stage.
+    """
+    stage_times()
+    generator.prepare(POST_TIME)
+    encode_image(generator, run_now(render_image, generator))
+    return stage_times()
+
+
+def batch_by_stage(poster, batch):
+    """Render and encode a batch as a post does, returning its stage times"""
+    stage_times()
+    poster.generate_batch_images(1, batch)
+    return stage_times()
+
+
+def max_rss_mb():
+    # Kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(name, size, runs, run_once):
+    """
+    Call `run_once()` `runs` times. It may return a dict of stage timings,
+    which are averaged.
+    """
+    timings = []
+    stage_totals = {}
+    tracemalloc.start()
+    for _ in range(runs):
+        started = timer.perf_counter()
+        stages = run_once() or {}
+        timings.append(timer.perf_counter() - started)
+        for key, seconds in stages.items():
+            stage_totals[key] = stage_totals.get(key, 0.0) + seconds
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    timings_ms = [seconds * 1000 for seconds in timings]
+    mean_ms = sum(timings_ms) / len(timings_ms)
+    return {
+        "scenario": name,
+        "size": size,
+        "runs": runs,
+        "mean_ms": mean_ms,
+        "p50_ms": percentile(timings_ms, 50),
+        "p90_ms": percentile(timings_ms, 90),
+        "per_image_ms": mean_ms / size,
+        "stages_ms": {
+            key: seconds * 1000 / runs for key, seconds in stage_totals.items()
+        },
+        "peak_python_kb": peak / 1024,
+        "max_rss_mb": max_rss_mb(),
+    }
+
+
+def run_benchmarks(batch_sizes=DEFAULT_BATCH_SIZES, runs=5, output_dir=None):
+    output_dir = output_dir or tempfile.mkdtemp(prefix="r4il-bench-")
+    base_path = output_dir.rstrip("/") + "/"
+    events = synthetic_events(max(len(SYNTHETIC_EVENTS), *batch_sizes))
+
+    def intro_once():
+        return generate_by_stage(
+            BenchmarkIntroImageGenerator(base_path=base_path, total_batches=2)
+        )
+
+    event_runs = iter(range(runs * len(SYNTHETIC_EVENTS)))
+
+    def event_once():
+        i = next(event_runs)
+        return generate_by_stage(
+            BenchmarkEventImageGenerator(
+                SYNTHETIC_EVENTS[i % len(SYNTHETIC_EVENTS)], base_path=base_path
+            )
+        )
+
+    # Warm up the font, layout and template caches, as in a real run
+    intro_once()
+    for event in SYNTHETIC_EVENTS:
+        generate_by_stage(BenchmarkEventImageGenerator(event, base_path=base_path))
+
+    results = [
+        measure("intro", 1, runs, intro_once),
+        measure("event", 1, runs * len(SYNTHETIC_EVENTS), event_once),
+    ]
+    for size in batch_sizes:
+        poster = BenchmarkPoster()
+        poster.base_path = base_path
+        batch = events[:size]
+        results.append(
+            measure(
+                "batch",
+                size + 1,  # Plus the intro image
+                max(1, runs // 2),
+                lambda: batch_by_stage(poster, batch),
+            )
+        )
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def save_results(results, results_dir):
+    commit = git_commit()
+    os.makedirs(results_dir, exist_ok=True)
+    path = os.path.join(results_dir, f"{datetime.now():%Y%m%d-%H%M%S}-{commit}.json")
+    with open(path, "w") as f:
+        json.dump({"commit": commit, "results": results}, f, indent=2)
+    return path
+
+
+def load_previous(compare, results_dir, exclude):
+    if compare != "latest":
+        path = compare
+    else:
+        paths = sorted(
+            path
+            for path in glob.glob(os.path.join(results_dir, "*.json"))
+            if path != exclude
+        )
+        if not paths:
+            return None, None
+        path = paths[-1]
+    with open(path) as f:
+        return path, json.load(f)
+
+
+def result_key(result):
+    return result["scenario"], result["size"]
+
+
+def print_results(results, previous=None):
+    previous_means = {
+        result_key(result): result["mean_ms"]
+        for result in (previous or {}).get("results", [])
+    }
+    stage_names = ["fonts", "layout", "compositing", "text_emoji", "encode"]
+    header = (
+        f"{'scenario':<10}{'images':>7}{'mean ms':>10}{'p90 ms':>9}{'ms/img':>9}"
+        + "".join(f"{name:>12}" for name in stage_names)
+        + f"{'peak KB':>10}{'change':>9}"
+    )
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        stages = result["stages_ms"]
+        before = previous_means.get(result_key(result))
+        change = f"{(result['mean_ms'] / before - 1) * 100:+.1f}%" if before else ""
+        print(
+            f"{result['scenario']:<10}{result['size']:>7}{result['mean_ms']:>10.1f}"
+            f"{result['p90_ms']:>9.1f}{result['per_image_ms']:>9.1f}"
+            + "".join(
+                f"{stages[name]:>12.2f}" if name in stages else f"{'':>12}"
+                for name in stage_names
+            )
+            + f"{result['peak_python_kb']:>10.0f}{change:>9}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--batch-sizes", type=int, nargs="+", default=DEFAULT_BATCH_SIZES
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--results-dir", default=DEFAULT_RESULTS_DIR)
+    parser.add_argument(
+        "--compare", help='A results file to compare against, or "latest"'
+    )
+    parser.add_argument("--no-save", action="store_true", help="Don't save the results")
+    args = parser.parse_args()
+
+    # Never fetch emojis over the network while timing
+    TwemojiEmojiSource.offline = True
+    with tempfile.TemporaryDirectory(prefix="r4il-bench-") as output_dir:
+        results = run_benchmarks(args.batch_sizes, args.runs, output_dir)
+    path = None if args.no_save else save_results(results, args.results_dir)
+    previous_path, previous = (
+        load_previous(args.compare, args.results_dir, exclude=path)
+        if args.compare
+        else (None, None)
+    )
+    print_results(results, previous)
+    if previous_path:
+        print(f"\nCompared with {previous_path} ({previous.get('commit')})")
+    if path:
+        print(f"Saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,392 @@
+"""
+Declarative card layouts.
+
+A CardLayout describes a card's frame, header panel, body blocks and footer.
+compile_layout() turns a layout and the fonts it names into a CompiledCard,
+working out every position, width and line height up front (and the footer
+entirely), so drawing a card only wraps its text and replays the operations.
+
+Block text is a str.format template filled from the values of each card, e.g.
+IconRow("📌", "{location}", "details").
+"""
+
+from dataclasses import dataclass
+from functools import lru_cache
+from PIL import Image, ImageChops, ImageDraw
+from r4ilpy.text_layout import fit_text, glyph_metrics, wrap_text
+
+INSTAGRAM_LOGO_PATH = "img/icons/instagram_logo.png"
+
+
+@lru_cache(maxsize=4)
+def load_instagram_logo(size):
+    with Image.open(INSTAGRAM_LOGO_PATH) as logo:
+        return logo.resize((size, size)).convert("RGBA")
+
+
+@lru_cache(maxsize=32)
+def rounded_rectangle_layer(rect, radius, fill):
+    """
+    A transparent patch just big enough for a rounded rectangle, and where to
+    composite it
+    """
+    (x1, y1), (x2, y2) = rect
+    layer = Image.new("RGBA", (x2 - x1 + 1, y2 - y1 + 1), (0, 0, 0, 0))
+    ImageDraw.Draw(layer).rounded_rectangle(
+        ((0, 0), (x2 - x1, y2 - y1)), radius=radius, fill=fill
+    )
+    bbox = layer.getbbox()
+    return layer.crop(bbox), (x1 + bbox[0], y1 + bbox[1])
+
+
+def composite_region(base, layer, offset):
+    """
+    Alpha composite `layer` onto the opaque RGB image `base` at `offset`,
+    converting only the region it covers
+    """
+    box = (*offset, offset[0] + layer.width, offset[1] + layer.height)
+    region = base.crop(box).convert("RGBA")
+    region.alpha_composite(layer)
+    base.paste(region.convert("RGB"), box)
+
+
+def text_size(font, text):
+    left, top, right, bottom = font.getbbox(text)
+    return right - left, bottom - top
+
+
+@dataclass(frozen=True)
+class Title:
+    """Text fitted into `max_lines` lines by shrinking the font if needed"""
+
+    text: str
+    font: str
+    max_lines: int = 3
+    min_font_size: int = 36
+    line_gap: int = 20
+
+
+@dataclass(frozen=True)
+class IconRow:
+    """An emoji bullet followed by wrapped text. Skipped when the text is empty."""
+
+    icon: str
+    text: str
+    font: str
+    # Vertical offset of the text from the emoji
+    text_offset: int = 0
+    line_spacing: int = 30
+
+
+@dataclass(frozen=True)
+class Spacer:
+    height: int
+
+
+@dataclass(frozen=True)
+class Footer:
+    """A message next to the Instagram logo, on a panel at the bottom"""
+
+    message: str
+    font: str
+    logo_size: int = 50
+    # Horizontal gap between the logo and the text
+    text_gap: int = 10
+    text_offset: int = 0
+
+
+@dataclass(frozen=True)
+class CardLayout:
+    body: tuple
+    footer: Footer
+    body_top: int = 250
+    width: int = 1080
+    height: int = 1080
+    padding: int = 60
+    border_thickness: int = 15
+    border_radius: int = 30
+    background_color: tuple = (0, 92, 144)  # Blue
+    border_color: tuple = (0, 0, 0)  # Black
+    panel_color: tuple = (232, 232, 232, 200)
+    text_color: str = "white"
+
+    @property
+    def canvas_size(self):
+        return (
+            self.width + 2 * self.border_thickness,
+            self.height + 2 * self.border_thickness,
+        )
+
+
+@dataclass(frozen=True)
+class CardFormat:
+    """
+    An output variant of a card. A format with a `height` re-frames the feed
+    card's body on a card of that height; one with a `size` is a scaled copy
+    of the feed card.
+    """
+
+    height: int | None = None
+    size: tuple | None = None
+
+
+CARD_FORMATS = {
+    "feed": CardFormat(),
+    # 9:16 including the border
+    "story": CardFormat(height=round(1110 * 16 / 9) - 30),
+    "thumbnail": CardFormat(size=(320, 320)),
+}
+
+
+@dataclass(frozen=True)
+class TitleOp:
+    text: str
+    x: int
+    max_width: int
+    font: object
+    max_lines: int
+    min_font_size: int
+    line_gap: int
+    fill: str
+
+    def draw(self, pilmoji, y, values):
+        font, lines = fit_text(
+            self.text.format_map(values),
+            self.font,
+            max_width=self.max_width,
+            max_lines=self.max_lines,
+            min_size=self.min_font_size,
+        )
+        line_height = glyph_metrics(font).line_height + self.line_gap
+        for line in lines:
+            pilmoji.text((self.x, y), line, font=font, fill=self.fill)
+            y += line_height
+        return y
+
+
+@dataclass(frozen=True)
+class IconRowOp:
+    icon: str
+    text: str
+    x_icon: int
+    x_text: int
+    text_offset: int
+    max_width: int
+    font: object
+    line_height: int
+    fill: str
+
+    def draw(self, pilmoji, y, values):
+        text = self.text.format_map(values)
+        for i, line in enumerate(wrap_text(text, self.font, self.max_width)):
+            if i == 0 and self.icon:
+                pilmoji.text(
+                    (self.x_icon, y), self.icon, font=self.font, fill=self.fill
+                )
+            pilmoji.text(
+                (self.x_text, y + self.text_offset),
+                line,
+                font=self.font,
+                fill=self.fill,
+            )
+            y += self.line_height
+        return y
+
+
+@dataclass(frozen=True)
+class SpacerOp:
+    height: int
+
+    def draw(self, pilmoji, y, values):
+        return y + self.height
+
+
+@dataclass(frozen=True)
+class FooterOp:
+    panel: Image.Image
+    panel_offset: tuple
+    logo: Image.Image
+    logo_position: tuple
+    message: str
+    text_position: tuple
+    font: object
+
+    @property
+    def top(self):
+        return self.panel_offset[1]
+
+    def draw(self, base):
+        composite_region(base, self.panel, self.panel_offset)
+        base.paste(self.logo, self.logo_position, mask=self.logo)
+        ImageDraw.Draw(base).text(
+            self.text_position, self.message, font=self.font, fill="black"
+        )
+
+
+@dataclass(frozen=True)
+class CompiledCard:
+    layout: CardLayout
+    body: tuple
+    footer: FooterOp
+
+    def render_frame(self, header_lines):
+        """
+        The canvas, border and header panel with `header_lines`, a list of
+        (text, font) pairs centered on the panel
+        """
+        layout = self.layout
+        base = Image.new("RGB", layout.canvas_size, layout.background_color)
+        border = layout.border_thickness
+        ImageDraw.Draw(base).rounded_rectangle(
+            [(border, border), (layout.width + border, layout.height + border)],
+            radius=layout.border_radius,
+            outline=layout.border_color,
+            width=border,
+        )
+
+        line_sizes = [text_size(font, text) for text, font in header_lines]
+        rect_x1, rect_y1, rect_width, rect_height = self.header_rect(line_sizes)
+        rect_padding = 20
+
+        # Composite the semi-transparent panel
+        panel, panel_offset = rounded_rectangle_layer(
+            ((rect_x1, rect_y1), (rect_x1 + rect_width, rect_y1 + rect_height)),
+            20,
+            layout.panel_color,
+        )
+        composite_region(base, panel, panel_offset)
+
+        draw = ImageDraw.Draw(base)
+        y_offset = rect_y1 + rect_padding
+        for (text, font), (text_width, text_height) in zip(header_lines, line_sizes):
+            x_position = rect_x1 + (rect_width - text_width) // 2
+            draw.text((x_position, y_offset), text, font=font, fill="black")
+            y_offset += text_height + 10
+        return base
+
+    def header_rect(self, line_sizes):
+        """The header panel's x, y, width and height for lines of these sizes"""
+        layout = self.layout
+        total_header_height = sum(height for _, height in line_sizes)
+        total_header_height += (len(line_sizes) - 1) * 10
+        rect_width = layout.width - 2 * layout.padding
+        rect_height = total_header_height + 2 * 20
+        rect_x1 = (layout.canvas_size[0] - rect_width) // 2
+        return rect_x1, layout.padding, rect_width, rect_height
+
+    def header_bottom(self, header_lines):
+        line_sizes = [text_size(font, text) for text, font in header_lines]
+        _, rect_y1, _, rect_height = self.header_rect(line_sizes)
+        return rect_y1 + rect_height
+
+    def reframe(self, feed_card, feed_image, frame, header_lines):
+        """
+        Move the body of `feed_image` (a render of `feed_card`) into `frame`,
+        a frame of this card, centred between the header and the footer. The
+        body is copied pixel for pixel, so it's never laid out or drawn again.
+        """
+        layout = feed_card.layout
+        top = feed_card.header_bottom(header_lines) + 1
+        bottom = feed_card.footer.top
+        # Trim to the rows with content, looking inside the border
+        inner = feed_image.crop(
+            (2 * layout.border_thickness, top, layout.width, bottom)
+        )
+        background = Image.new("RGB", inner.size, layout.background_color)
+        content = ImageChops.difference(inner, background).getbbox()
+        if content:
+            top, bottom = top + content[1], top + content[3]
+        body = feed_image.crop((0, top, feed_image.width, bottom))
+
+        space_top = self.header_bottom(header_lines) + 1
+        space = self.footer.top - space_top
+        frame.paste(body, (0, space_top + max(0, space - body.height) // 2))
+        self.footer.draw(frame)
+        return frame
+
+    def draw_body(self, pilmoji, values):
+        y = self.layout.body_top
+        for op in self.body:
+            y = op.draw(pilmoji, y, values)
+        return y
+
+
+def compile_block(layout, block, fonts):
+    font = fonts.get(getattr(block, "font", None))
+    if isinstance(block, Title):
+        return TitleOp(
+            text=block.text,
+            x=layout.padding,
+            max_width=layout.width - 2 * layout.padding,
+            font=font,
+            max_lines=block.max_lines,
+            min_font_size=block.min_font_size,
+            line_gap=block.line_gap,
+            fill=layout.text_color,
+        )
+    if isinstance(block, IconRow):
+        x_icon = layout.padding
+        x_text = x_icon + 75  # Space for emoji
+        return IconRowOp(
+            icon=block.icon,
+            text=block.text,
+            x_icon=x_icon,
+            x_text=x_text,
+            text_offset=block.text_offset,
+            # Up to a border's width from the inside of the border
+            max_width=layout.width - x_text - layout.border_thickness,
+            font=font,
+            line_height=glyph_metrics(font).cap_height + block.line_spacing,
+            fill=layout.text_color,
+        )
+    if isinstance(block, Spacer):
+        return SpacerOp(block.height)
+    raise TypeError(f"Unknown layout block: {block!r}")
+
+
+def compile_footer(layout, footer, fonts):
+    font = fonts[footer.font]
+    canvas_width = layout.canvas_size[0]
+    text_width, text_height = text_size(font, footer.message)
+    # Center the logo and text as a group
+    total_width = footer.logo_size + 10 + text_width
+    x_position = (canvas_width - total_width) // 2
+    y_position = layout.height - layout.padding - text_height + 10
+    rect_padding = 20
+    panel, panel_offset = rounded_rectangle_layer(
+        (
+            (x_position - rect_padding, y_position - rect_padding + 5),
+            (
+                x_position + total_width + rect_padding,
+                y_position + text_height + rect_padding,
+            ),
+        ),
+        15,
+        layout.panel_color,
+    )
+    return FooterOp(
+        panel=panel,
+        panel_offset=panel_offset,
+        logo=load_instagram_logo(footer.logo_size),
+        logo_position=(x_position, y_position),
+        message=footer.message,
+        text_position=(
+            x_position + footer.logo_size + footer.text_gap,
+            y_position + footer.text_offset,
+        ),
+        font=font,
+    )
+
+
+@lru_cache(maxsize=32)
+def compile_layout(layout, fonts):
+    """
+    Compile `layout` with `fonts`, a tuple of (name, font) pairs for the
+    font names used by its blocks
+    """
+    fonts = dict(fonts)
+    return CompiledCard(
+        layout=layout,
+        body=tuple(compile_block(layout, block, fonts) for block in layout.body),
+        footer=compile_footer(layout, layout.footer, fonts),
+    )
@@ -0,0 +1,113 @@
+"""
+Packs the repo's twemoji images into a single atlas file, so emojis can be
+served from one memory map instead of one file open per emoji.
+
+    poetry run python -m r4ilpy.emoji_atlas build
+
+Layout: magic, little-endian u32 index length, JSON index of
+{filename: [offset, length]}, then the PNG data. Offsets are relative to the
+end of the index.
+"""
+
+import argparse
+from functools import lru_cache
+import json
+import mmap
+import os
+import struct
+import tempfile
+
+MAGIC = b"R4ILEMJ1"
+HEADER = struct.Struct("<8sI")
+DEFAULT_EMOJI_FOLDER = "emojis/twemoji"
+
+
+def default_atlas_path(emoji_folder):
+    return emoji_folder.rstrip("/\\") + ".atlas"
+
+
+def build_atlas(emoji_folder=DEFAULT_EMOJI_FOLDER, atlas_path=None):
+    """Write every PNG in `emoji_folder` to an atlas. Returns the atlas path."""
+    atlas_path = atlas_path or default_atlas_path(emoji_folder)
+    index = {}
+    blobs = []
+    offset = 0
+    for filename in sorted(os.listdir(emoji_folder)):
+        if not filename.endswith(".png"):
+            continue
+        with open(os.path.join(emoji_folder, filename), "rb") as f:
+            data = f.read()
+        index[filename] = [offset, len(data)]
+        blobs.append(data)
+        offset += len(data)
+    index_bytes = json.dumps(index, separators=(",", ":")).encode()
+
+    directory = os.path.dirname(atlas_path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(index_bytes)))
+        f.write(index_bytes)
+        for data in blobs:
+            f.write(data)
+    os.replace(tmp_path, atlas_path)
+    return atlas_path
+
+
+class EmojiAtlas:
+    """Read-only, memory-mapped view of an atlas file"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, index_length = HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError(f"Not an emoji atlas: {path}")
+        index_start = HEADER.size
+        self._data_start = index_start + index_length
+        self.index = json.loads(self._map[index_start : self._data_start])
+
+    def __contains__(self, filename):
+        return filename in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def get(self, filename):
+        """PNG bytes for `filename`, or None if it isn't in the atlas"""
+        try:
+            offset, length = self.index[filename]
+        except KeyError:
+            return None
+        start = self._data_start + offset
+        return self._map[start : start + length]
+
+    def close(self):
+        self._map.close()
+
+
+@lru_cache(maxsize=8)
+def open_atlas(path):
+    """The atlas at `path`, mapped once per process, or None if there isn't one"""
+    try:
+        return EmojiAtlas(path)
+    except (OSError, ValueError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build", help="Build the atlas")
+    build.add_argument("--emoji-folder", default=DEFAULT_EMOJI_FOLDER)
+    build.add_argument("--output")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        path = build_atlas(args.emoji_folder, args.output)
+        print(f"Packed {len(open_atlas(path))} emojis into {path}")
+
+
+if __name__ == "__main__":
+    main()
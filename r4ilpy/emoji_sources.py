@@ -1,37 +1,89 @@
+from functools import lru_cache
 from io import BytesIO
 import os
 from pilmoji.source import TwitterEmojiSource
+from r4ilpy.emoji_atlas import default_atlas_path, open_atlas
+from r4ilpy.settings import EMOJI_OFFLINE
+
+VARIATION_SELECTOR_16 = "\ufe0f"
+EMOJI_CACHE_SIZE = 512
+
+
+class EmojiUnavailable(Exception):
+    """An emoji couldn't be downloaded, which may work on a later try"""
+
+
+@lru_cache(maxsize=8)
+def emoji_filenames(emoji_folder):
+    """Names of the emoji images in `emoji_folder`, listed once per process"""
+    try:
+        return frozenset(os.listdir(emoji_folder))
+    except OSError:
+        return frozenset()
+
+
+@lru_cache(maxsize=1024)
+def emoji_to_filename(emoji):
+    """
+    Convert an emoji or emoji sequence into the corresponding Twemoji filename.
+    """
+    # Convert the emoji to its codepoints, ignoring the variation selector (U+FE0F)
+    codepoints = [f"{ord(char):x}" for char in emoji if char != VARIATION_SELECTOR_16]
+    return "-".join(codepoints) + ".png"
+
+
+@lru_cache(maxsize=EMOJI_CACHE_SIZE)
+def load_emoji(emoji_folder, emoji, offline=False):
+    """
+    Image bytes of `emoji`, shared by every source in the process. None marks
+    an emoji missing in offline mode, so it isn't looked up again. A failed
+    download raises EmojiUnavailable instead, which isn't cached.
+    """
+    filename = emoji_to_filename(emoji)
+    file_path = os.path.join(emoji_folder, filename)
+    atlas = open_atlas(default_atlas_path(emoji_folder))
+    if atlas is not None and filename in atlas:
+        return atlas.get(filename)
+    if filename in emoji_filenames(emoji_folder):
+        with open(file_path, "rb") as f:
+            return f.read()
+    if offline:
+        print(f"emoji not found (offline): {emoji}; {file_path}")
+        return None
+    print(f"emoji not found: {emoji}; {file_path}")
+    stream = TwitterEmojiSource().get_emoji(emoji)
+    if stream is None:
+        raise EmojiUnavailable(emoji)
+    return stream.read()
 
 
 class TwemojiEmojiSource(TwitterEmojiSource):
     """
     Use twemoji emojis from the repo if they are found, otherwise use the
-    regular TwitterEmojiSource
+    regular TwitterEmojiSource. Emojis are read from the packed atlas next to
+    the emoji folder when one has been built (see r4ilpy.emoji_atlas).
 
     Emojis copied from https://github.com/twitter/twemoji
     """
 
+    # When True, emojis missing from the repo are skipped instead of being
+    # downloaded in the middle of a render
+    offline = EMOJI_OFFLINE
+
     def __init__(self, emoji_folder="emojis/twemoji"):
         super().__init__()
         self.emoji_folder = emoji_folder
 
     def get_emoji(self, emoji: str) -> BytesIO | None:
-        file_path = os.path.join(self.emoji_folder, self.emoji_to_filename(emoji))
-        if os.path.exists(file_path):
-            return open(file_path, "rb")  # Return a file-like object
-        print(f"emoji not found: {emoji}; {file_path}")
-        return super().get_emoji(emoji)
+        data = self.load_emoji(emoji)
+        # A fresh stream each time, since Pilmoji closes the ones it's given
+        return BytesIO(data) if data is not None else None
+
+    def load_emoji(self, emoji):
+        try:
+            return load_emoji(self.emoji_folder, emoji, self.offline)
+        except EmojiUnavailable:
+            return None
 
     def emoji_to_filename(self, emoji):
-        """
-        Convert an emoji or emoji sequence into the corresponding Twemoji filename.
-        """
-        import unicodedata
-
-        # Convert the emoji to its codepoints, ignoring the variation selector (U+FE0F)
-        codepoints = [
-            f"{ord(char):x}"
-            for char in emoji
-            if unicodedata.name(char) != "VARIATION SELECTOR-16"
-        ]
-        return "-".join(codepoints) + ".png"
+        return emoji_to_filename(emoji)
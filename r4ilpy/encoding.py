@@ -0,0 +1,102 @@
+from dataclasses import dataclass
+from io import BytesIO
+import os
+import time
+from r4ilpy.settings import (
+    JPEG_MAX_BYTES,
+    JPEG_OPTIMIZE,
+    JPEG_PROGRESSIVE,
+    JPEG_QUALITY,
+    JPEG_SUBSAMPLING,
+)
+
+JPEG_EXTENSIONS = (".jpg", ".jpeg")
+
+
+@dataclass(frozen=True, slots=True)
+class EncodeStats:
+    filename: str
+    bytes: int
+    seconds: float
+    quality: int | None
+
+
+class JpegEncoder:
+    """
+    Writes rendered images as JPEGs with explicit settings. With `max_bytes`,
+    the quality is lowered (by binary search, down to `min_quality`) until the
+    file fits. Other file types are saved with Pillow's defaults.
+    """
+
+    def __init__(
+        self,
+        quality=JPEG_QUALITY,
+        subsampling=JPEG_SUBSAMPLING,
+        progressive=JPEG_PROGRESSIVE,
+        optimize=JPEG_OPTIMIZE,
+        max_bytes=JPEG_MAX_BYTES,
+        min_quality=30,
+    ):
+        self.quality = quality
+        self.subsampling = subsampling
+        self.progressive = progressive
+        self.optimize = optimize
+        self.max_bytes = max_bytes
+        self.min_quality = min(min_quality, quality)
+
+    @property
+    def options(self):
+        """Everything that affects the encoded file, for render fingerprints"""
+        return {
+            "quality": self.quality,
+            "subsampling": self.subsampling,
+            "progressive": self.progressive,
+            "optimize": self.optimize,
+            "max_bytes": self.max_bytes,
+            "min_quality": self.min_quality,
+        }
+
+    def encode_at(self, image, quality):
+        buffer = BytesIO()
+        image.save(
+            buffer,
+            "JPEG",
+            quality=quality,
+            subsampling=self.subsampling,
+            progressive=self.progressive,
+            optimize=self.optimize,
+        )
+        return buffer.getvalue()
+
+    def encode(self, image):
+        """Returns the JPEG bytes and the quality used"""
+        data = self.encode_at(image, self.quality)
+        if not self.max_bytes or len(data) <= self.max_bytes:
+            return data, self.quality
+        # Highest quality that fits, or the smallest file if none does
+        best = None
+        low, high = self.min_quality, self.quality - 1
+        while low <= high:
+            quality = (low + high) // 2
+            candidate = self.encode_at(image, quality)
+            if len(candidate) <= self.max_bytes:
+                best = candidate, quality
+                low = quality + 1
+            else:
+                high = quality - 1
+        return best or (self.encode_at(image, self.min_quality), self.min_quality)
+
+    def save(self, image, filename):
+        started = time.perf_counter()
+        if os.path.splitext(filename)[1].lower() in JPEG_EXTENSIONS:
+            data, quality = self.encode(image)
+            with open(filename, "wb") as f:
+                f.write(data)
+            size = len(data)
+        else:
+            image.save(filename)
+            size, quality = os.path.getsize(filename), None
+        return EncodeStats(filename, size, time.perf_counter() - started, quality)
+
+
+JPEG_ENCODER = JpegEncoder()
@@ -1,8 +1,10 @@
-from dataclasses import dataclass
-from datetime import datetime
+from array import array
+from dataclasses import dataclass, field
+from datetime import date as Date, datetime, time
+from functools import lru_cache
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Event:
     title: str
     date: str
@@ -10,14 +12,63 @@ class Event:
     location: str
 
 
+@dataclass(slots=True)
+class EventColumns:
+    """
+    Events stored column by column, for large exports. Dates are stored as
+    ordinals and start times as minutes after midnight (-1 when missing).
+    """
+
+    titles: list = field(default_factory=list)
+    dates: array = field(default_factory=lambda: array("l"))
+    start_times: array = field(default_factory=lambda: array("h"))
+    locations: list = field(default_factory=list)
+
+    def __len__(self):
+        return len(self.titles)
+
+    def __getitem__(self, index):
+        start_time = self.start_times[index]
+        return Event(
+            title=self.titles[index],
+            date=Date.fromordinal(self.dates[index]),
+            start_time=None if start_time < 0 else time(*divmod(start_time, 60)),
+            location=self.locations[index],
+        )
+
+    def __iter__(self):
+        return (self[index] for index in range(len(self)))
+
+    def append(self, event):
+        self.titles.append(event.title)
+        self.dates.append(event.date.toordinal())
+        start_time = event.start_time
+        self.start_times.append(
+            -1 if start_time is None else start_time.hour * 60 + start_time.minute
+        )
+        self.locations.append(event.location)
+
+
+# The same few dates and start times repeat across records, so strptime only
+# needs to run once per distinct string
+@lru_cache(maxsize=1024)
+def parse_start_time(value):
+    return datetime.strptime(value, "%I:%M%p").time()
+
+
+@lru_cache(maxsize=4096)
+def parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
 def airtable_record_to_event(record: dict) -> Event:
     record_fields = record["fields"]
     start_time_str = record_fields.get("Start Time")
     if start_time_str:
-        start_time = datetime.strptime(start_time_str, "%I:%M%p").time()
+        start_time = parse_start_time(start_time_str)
     else:
         start_time = None
-    date = datetime.strptime(record_fields.get("Date"), "%Y-%m-%d").date()
+    date = parse_date(record_fields.get("Date"))
 
     return Event(
         title=record_fields.get("Title"),
@@ -25,3 +76,14 @@ def airtable_record_to_event(record: dict) -> Event:
         start_time=start_time,
         location=record_fields.get("Location"),
     )
+
+
+def airtable_records_to_events(
+    records: list[dict], columnar: bool = False
+) -> list[Event] | EventColumns:
+    if not columnar:
+        return [airtable_record_to_event(record) for record in records]
+    columns = EventColumns()
+    for record in records:
+        columns.append(airtable_record_to_event(record))
+    return columns
@@ -0,0 +1,535 @@
+"""
+Local stand-in for the Airtable list records API, for load testing connectors
+without touching the real base.
+
+Point a connector (or pyairtable's Api) at `FakeAirtableServer.url` through its
+`endpoint_url`. Supports pagination with offsets, `view`, `fields`, `sort`,
+`maxRecords`, a basic subset of `filterByFormula`, per-request latency and
+injected 429 responses.
+
+Run a standalone server with synthetic events:
+
+    poetry run python -m r4ilpy.fake_airtable --records 10000 --port 8787
+"""
+
+import argparse
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import random
+import re
+import threading
+import time
+from urllib.parse import parse_qs, unquote, urlparse
+
+
+class FormulaError(ValueError):
+    pass
+
+
+def _to_datetime(value):
+    if isinstance(value, datetime):
+        return value
+    if not value:
+        return None
+    value = datetime.fromisoformat(str(value))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _compare_dates(compare):
+    def _function(left, right, *unit):
+        left, right = _to_datetime(left), _to_datetime(right)
+        if left is None or right is None:
+            return False
+        return compare(left, right)
+
+    return _function
+
+
+def _find(needle, haystack, start=0):
+    return str(haystack or "").find(str(needle or ""), int(start)) + 1
+
+
+FORMULA_FUNCTIONS = {
+    "AND": lambda *args: all(args),
+    "OR": lambda *args: any(args),
+    "NOT": lambda value: not value,
+    "IF": lambda condition, then, otherwise=None: then if condition else otherwise,
+    "BLANK": lambda: None,
+    "TRUE": lambda: True,
+    "FALSE": lambda: False,
+    "LOWER": lambda value: str(value or "").lower(),
+    "UPPER": lambda value: str(value or "").upper(),
+    "LEN": lambda value: len(str(value or "")),
+    "FIND": _find,
+    "DATETIME_PARSE": lambda value, *format: _to_datetime(value),
+    "IS_BEFORE": _compare_dates(lambda left, right: left < right),
+    "IS_AFTER": _compare_dates(lambda left, right: left > right),
+    "IS_SAME": _compare_dates(lambda left, right: left == right),
+}
+
+# Where the server puts a record's ID among its fields, for RECORD_ID()
+RECORD_ID_FIELD = "__record_id__"
+
+COMPARISONS = {
+    "=": lambda left, right: left == right,
+    "!=": lambda left, right: left != right,
+    "<": lambda left, right: left < right,
+    ">": lambda left, right: left > right,
+    "<=": lambda left, right: left <= right,
+    ">=": lambda left, right: left >= right,
+}
+
+TOKEN_PATTERN = re.compile(
+    r"""\s*(?:
+        (?P<field>\{[^}]*\})
+        |(?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+        |(?P<number>\d+(?:\.\d+)?)
+        |(?P<name>[A-Za-z_][A-Za-z_0-9]*)
+        |(?P<operator>!=|<=|>=|=|<|>|&|\(|\)|,)
+    )""",
+    re.VERBOSE,
+)
+
+
+def _tokenize(formula):
+    tokens = []
+    position = 0
+    formula = formula.strip()
+    while position < len(formula):
+        match = TOKEN_PATTERN.match(formula, position)
+        if not match or match.end() == position:
+            raise FormulaError(f"Unexpected input at {position}: {formula!r}")
+        tokens.append((match.lastgroup, match.group(match.lastgroup)))
+        position = match.end()
+    return tokens
+
+
+class _FormulaParser:
+    """
+    Compiles a formula into a function of a record's fields
+    """
+
+    def __init__(self, formula):
+        self.tokens = _tokenize(formula)
+        self.position = 0
+
+    def parse(self):
+        compiled = self._comparison()
+        if self.position != len(self.tokens):
+            raise FormulaError(f"Unexpected token {self.tokens[self.position]}")
+        return compiled
+
+    def _peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return (None, None)
+
+    def _take(self, value=None):
+        token = self._peek()
+        if token[0] is None or (value is not None and token[1] != value):
+            raise FormulaError(f"Expected {value!r}, got {token[1]!r}")
+        self.position += 1
+        return token
+
+    def _comparison(self):
+        left = self._concatenation()
+        kind, value = self._peek()
+        if kind == "operator" and value in COMPARISONS:
+            self._take()
+            right = self._concatenation()
+            compare = COMPARISONS[value]
+            return lambda fields: compare(left(fields), right(fields))
+        return left
+
+    def _concatenation(self):
+        parts = [self._primary()]
+        while self._peek() == ("operator", "&"):
+            self._take()
+            parts.append(self._primary())
+        if len(parts) == 1:
+            return parts[0]
+        return lambda fields: "".join(str(part(fields) or "") for part in parts)
+
+    def _primary(self):
+        kind, value = self._take()
+        if kind == "field":
+            name = value[1:-1]
+            return lambda fields: fields.get(name)
+        if kind == "string":
+            text = value[1:-1].replace(f"\\{value[0]}", value[0])
+            return lambda fields: text
+        if kind == "number":
+            number = float(value) if "." in value else int(value)
+            return lambda fields: number
+        if kind == "operator" and value == "(":
+            inner = self._comparison()
+            self._take(")")
+            return inner
+        if kind == "name" and value.upper() == "RECORD_ID":
+            self._take("(")
+            self._take(")")
+            return lambda fields: fields.get(RECORD_ID_FIELD)
+        if kind == "name":
+            function = FORMULA_FUNCTIONS.get(value.upper())
+            if function is None:
+                raise FormulaError(f"Unsupported function {value}")
+            self._take("(")
+            args = []
+            if self._peek() != ("operator", ")"):
+                args.append(self._comparison())
+                while self._peek() == ("operator", ","):
+                    self._take()
+                    args.append(self._comparison())
+            self._take(")")
+            return lambda fields: function(*(arg(fields) for arg in args))
+        raise FormulaError(f"Unexpected token {value!r}")
+
+
+def compile_formula(formula):
+    return _FormulaParser(formula).parse()
+
+
+def _sort_value(value):
+    # Blank values sort first, like Airtable's ascending sort
+    return (value is not None and value != "", value if value is not None else "")
+
+
+class FakeAirtableServer:
+    """
+    Threaded HTTP server answering list records requests from in-memory tables.
+
+    `tables` maps table ids or names to lists of records. `views` optionally
+    maps view names to `{"sort": [...], "formula": ...}`; when it is given,
+    unknown views are rejected like Airtable does.
+    """
+
+    max_page_size = 100
+
+    def __init__(
+        self,
+        tables,
+        views=None,
+        latency=0.0,
+        throttle_rate=0.0,
+        requests_per_second=None,
+        retry_after=None,
+        host="127.0.0.1",
+        port=0,
+        seed=0,
+    ):
+        self.tables = tables
+        self.views = views
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.requests_per_second = requests_per_second
+        self.retry_after = retry_after
+        self.request_count = 0
+        self.throttled_count = 0
+        self._random = random.Random(seed)
+        self._recent_requests = []
+        self._results = {}
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = self._query_from_params(parse_qs(url.query))
+                self._respond(*server.handle(url.path, query))
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                path = url.path.removesuffix("/listRecords")
+                query = {
+                    "view": body.get("view"),
+                    "fields": body.get("fields"),
+                    "formula": body.get("filterByFormula"),
+                    "page_size": body.get("pageSize"),
+                    "max_records": body.get("maxRecords"),
+                    "offset": body.get("offset"),
+                    "sort": [
+                        (sort["field"], sort.get("direction", "asc"))
+                        for sort in body.get("sort", [])
+                    ],
+                }
+                offset = parse_qs(url.query).get("offset")
+                if offset:
+                    query["offset"] = offset[0]
+                self._respond(*server.handle(path, query))
+
+            def _query_from_params(self, params):
+                def first(name):
+                    return params.get(name, [None])[0]
+
+                sort = []
+                index = 0
+                while f"sort[{index}][field]" in params:
+                    sort.append(
+                        (
+                            first(f"sort[{index}][field]"),
+                            first(f"sort[{index}][direction]") or "asc",
+                        )
+                    )
+                    index += 1
+                return {
+                    "view": first("view"),
+                    "fields": params.get("fields[]"),
+                    "formula": first("filterByFormula"),
+                    "page_size": first("pageSize"),
+                    "max_records": first("maxRecords"),
+                    "offset": first("offset"),
+                    "sort": sort,
+                }
+
+            def _respond(self, status, body, headers):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def handle(self, path, query):
+        """
+        Returns (status, body, headers) for a list records request
+        """
+        if self.latency:
+            time.sleep(self.latency)
+        if self._should_throttle():
+            headers = {"Retry-After": str(self.retry_after)} if self.retry_after else {}
+            return 429, {"errors": [{"error": "RATE_LIMIT_REACHED"}]}, headers
+
+        parts = [unquote(part) for part in path.strip("/").split("/")]
+        if len(parts) != 3 or parts[0] != "v0" or parts[2] not in self.tables:
+            return 404, {"error": "NOT_FOUND"}, {}
+        table_id = parts[2]
+        view = query.get("view")
+        if self.views is not None and view is not None and view not in self.views:
+            return 422, {"error": {"type": "VIEW_NAME_NOT_FOUND"}}, {}
+
+        try:
+            records = self._results_for(table_id, query)
+        except FormulaError as e:
+            error = {"type": "INVALID_FILTER_BY_FORMULA", "message": str(e)}
+            return 422, {"error": error}, {}
+
+        offset = query.get("offset")
+        start = int(offset.rsplit("/", 1)[-1]) if offset else 0
+        page_size = min(int(query.get("page_size") or 100), self.max_page_size)
+        end = start + page_size
+        body = {"records": records[start:end]}
+        if end < len(records):
+            body["offset"] = f"itr{len(records)}/{end}"
+        return 200, body, {}
+
+    def _should_throttle(self):
+        with self._lock:
+            self.request_count += 1
+            now = time.monotonic()
+            throttled = False
+            if self.requests_per_second:
+                self._recent_requests = [
+                    moment for moment in self._recent_requests if now - moment < 1
+                ]
+                if len(self._recent_requests) >= self.requests_per_second:
+                    throttled = True
+                else:
+                    self._recent_requests.append(now)
+            if not throttled and self.throttle_rate:
+                throttled = self._random.random() < self.throttle_rate
+            if throttled:
+                self.throttled_count += 1
+            return throttled
+
+    def _results_for(self, table_id, query):
+        """
+        Filtered, sorted and projected records for a query, computed once per
+        distinct query so paging through large tables stays cheap
+        """
+        key = json.dumps(
+            [
+                table_id,
+                {name: value for name, value in query.items() if name != "offset"},
+            ],
+            sort_keys=True,
+            default=str,
+        )
+        with self._lock:
+            cached = self._results.get(key)
+        if cached is not None:
+            return cached
+
+        records = self.tables[table_id]
+        view = (self.views or {}).get(query.get("view")) or {}
+        for formula in (view.get("formula"), query.get("formula")):
+            if formula:
+                matches = compile_formula(formula)
+                records = [
+                    record
+                    for record in records
+                    if matches({**record["fields"], RECORD_ID_FIELD: record["id"]})
+                ]
+        sort = query.get("sort") or [
+            (name.lstrip("-"), "desc" if name.startswith("-") else "asc")
+            for name in view.get("sort", [])
+        ]
+        for field, direction in reversed(sort):
+            records = sorted(
+                records,
+                key=lambda record: _sort_value(record["fields"].get(field)),
+                reverse=direction == "desc",
+            )
+        if query.get("max_records"):
+            records = records[: int(query["max_records"])]
+        fields = query.get("fields")
+        if fields:
+            records = [
+                {
+                    **record,
+                    "fields": {
+                        name: value
+                        for name, value in record["fields"].items()
+                        if name in fields
+                    },
+                }
+                for record in records
+            ]
+
+        with self._lock:
+            self._results[key] = records
+        return records
+
+
+LOCATIONS = [
+    "City Hall Plaza",
+    "Federal Building, 26 Federal Plaza",
+    "DePaul University - Lincoln Park Student Center, 2250 N. Sheffield Ave.",
+    "Online",
+    "",
+]
+
+TITLES = [
+    "Rally for the Hostages",
+    "Stand With Israel",
+    "Chicago (DePaul): Stop the Hate: Rally for Jewish Students",
+    "Bring Them Home Now 🎗️",
+    "Community Vigil",
+]
+
+
+def synthetic_event_records(count, start=None, days=None, seed=0):
+    """
+    Calendar records shaped like the events table, spread over `days` days
+    (one day per 20 events by default), with about a fifth of them belonging
+    to recurring series
+    """
+    generator = random.Random(seed)
+    start = start or datetime(2024, 1, 1, tzinfo=timezone.utc)
+    days = days or max(1, count // 20)
+    series_ids = [f"series{number}" for number in range(max(1, count // 50))]
+    records = []
+    for number in range(count):
+        event_start = start + timedelta(minutes=generator.randrange(days * 24 * 4) * 15)
+        all_day = generator.random() < 0.1
+        records.append(
+            {
+                "id": f"rec{number:014d}",
+                "createdTime": start.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+                "fields": {
+                    "Title": f"{generator.choice(TITLES)} #{number}",
+                    "Start": event_start.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+                    "Date": event_start.strftime("%Y-%m-%d"),
+                    "Start Time": (
+                        None
+                        if all_day
+                        else event_start.strftime("%I:%M%p").lstrip("0").lower()
+                    ),
+                    "All Day": all_day,
+                    "Location": generator.choice(LOCATIONS),
+                    "Recurring Event ID": (
+                        generator.choice(series_ids) if generator.random() < 0.2 else ""
+                    ),
+                    "Last Modified": start.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+                    "Description": "Join us to stand together. " * 10,
+                    "Organizer": "Rally4Israel",
+                },
+            }
+        )
+        if records[-1]["fields"]["Start Time"] is None:
+            del records[-1]["fields"]["Start Time"]
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--records", type=int, default=1000)
+    parser.add_argument("--table", default="tblEvents")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--requests-per-second", type=int)
+    args = parser.parse_args()
+
+    server = FakeAirtableServer(
+        {args.table: synthetic_event_records(args.records)},
+        latency=args.latency,
+        throttle_rate=args.throttle_rate,
+        requests_per_second=args.requests_per_second,
+        host=args.host,
+        port=args.port,
+    )
+    print(f"Serving {args.records} records from table {args.table} at {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
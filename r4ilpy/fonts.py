@@ -0,0 +1,19 @@
+from functools import lru_cache
+import os
+from PIL import ImageFont
+
+FONT_DIR = os.path.join(os.path.dirname(__file__), "../fonts")
+
+
+def font_path(filename):
+    return os.path.join(FONT_DIR, filename)
+
+
+# Room for the sizes tried while fitting titles, see r4ilpy.text_layout
+@lru_cache(maxsize=64)
+def load_font(path, size):
+    """
+    Load a TrueType font once per process and reuse it for every image.
+    Failures aren't cached, so a missing font raises OSError on every call.
+    """
+    return ImageFont.truetype(path, size)
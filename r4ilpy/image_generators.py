@@ -1,230 +1,262 @@
+from abc import ABC, abstractmethod
 from datetime import date, datetime, time
-from PIL import Image, ImageDraw, ImageFont
-import textwrap
+from PIL import Image, ImageFont
 import subprocess
 import platform
+from r4ilpy.card_layout import (
+    CARD_FORMATS,
+    CardLayout,
+    Footer,
+    IconRow,
+    Spacer,
+    Title,
+    compile_layout,
+)
 from r4ilpy.emoji_sources import TwemojiEmojiSource
+from r4ilpy.encoding import JPEG_ENCODER
 from r4ilpy.events import Event, airtable_record_to_event
+from r4ilpy.fonts import font_path, load_font
+from r4ilpy.instrumentation import TRACER
+from r4ilpy.render_cache import RenderCache, font_fingerprint, render_fingerprint
+from r4ilpy.settings import RENDER_CACHE_DIR, RENDER_FORMATS
 from r4ilpy.airtable import get_filtered_calendar_records
 from pilmoji import Pilmoji
+from collections import OrderedDict
+from dataclasses import replace
 import os
-
-
-class IntroImageGenerator:
-    padding = 60
-
-    def __init__(
-        self,
-        filename="intro_image.jpg",
-        batch_no=1,
-        total_batches=1,
-        base_path="img/instagram/",
-    ):
+import threading
+
+TEMPLATE_CACHE_SIZE = 32
+RENDER_CACHE = RenderCache(RENDER_CACHE_DIR) if RENDER_CACHE_DIR else None
+
+_template_cache = OrderedDict()
+_template_cache_lock = threading.Lock()
+
+
+def cached_template(key, render):
+    """
+    Return a copy of the template image for `key`, rendering it the first
+    time. The least recently used templates are evicted past
+    TEMPLATE_CACHE_SIZE.
+    """
+    with _template_cache_lock:
+        template = _template_cache.get(key)
+        if template is not None:
+            _template_cache.move_to_end(key)
+    if template is None:
+        template = render()
+        with _template_cache_lock:
+            _template_cache[key] = template
+            while len(_template_cache) > TEMPLATE_CACHE_SIZE:
+                _template_cache.popitem(last=False)
+    return template.copy()
+
+
+def font_key(font):
+    return getattr(font, "path", None), getattr(font, "size", None)
+
+
+class CardImageGenerator(ABC):
+    """
+    Renders a card from a CardLayout (see r4ilpy.card_layout). Subclasses
+    set the layout and provide its fonts, the header lines and the values its
+    text is filled from.
+    """
+
+    layout: CardLayout
+    # Bump when the layout changes, so cached renders aren't reused
+    template_version = 3
+    render_cache = RENDER_CACHE
+    encoder = JPEG_ENCODER
+    tracer = TRACER
+    # Formats written by generate(), see CARD_FORMATS. Only the feed card is
+    # fully rendered; the other formats reuse its body.
+    formats = RENDER_FORMATS
+
+    def __init__(self, filename, batch_no=1, base_path="img/instagram/"):
         self.base_path = base_path
         self.batch_no = batch_no
-        self.total_batches = total_batches
         self.filename = f"{self.base_path}batches/{self.batch_no}/{filename}"
-        self.width = self.height = 1080
-        self.border_thickness = 15
-        self.border_radius = 30
-        self.background_color = (0, 92, 144)  # Blue
-        self.border_color = (0, 0, 0)  # Black
-        self.header_footer_background = (232, 232, 232, 200)
-
-    def create_base_image(self):
-        return Image.new(
-            "RGB",
-            (
-                self.width + 2 * self.border_thickness,
-                self.height + 2 * self.border_thickness,
-            ),
-            self.background_color,
-        )
 
-    def wrap_text(self, text, max_chars=40):
-        return textwrap.wrap(text, width=max_chars)
+    @property
+    def width(self):
+        return self.layout.width
 
-    def get_font_size(self, font, text):
-        try:
-            return font.getsize(text)
-        except AttributeError:
-            left, top, right, bottom = font.getbbox(text)
-            tw, th = right - left, bottom - top
-            return tw, th
-
-    def draw_icon_and_text(
-        self, pilmoji, icon, text, y_position, font, max_width=520, line_spacing=30
-    ):
-        """Draw an emoji (bullet point) and wrapped text."""
-        lines = self.wrap_text(
-            text, max_chars=max_width // self.get_font_size(self.font_subtitle, " ")[0]
-        )
-        x_icon = self.padding
-        x_text = x_icon + 75  # Space for emoji
-        line_height = self.get_font_size(font, "A")[1] + line_spacing
-        for i, line in enumerate(lines):
-            if i == 0 and icon:
-                pilmoji.text((x_icon, y_position), icon, font=font, fill="white")
-            pilmoji.text(
-                (x_text, y_position - 10),
-                line,
-                font=font,
-                fill="white",
-            )
-            y_position += line_height
-        return y_position
+    @property
+    def height(self):
+        return self.layout.height
 
     def generate(self, open_when_done=False, post_time=None):
+        with self.tracer.span(
+            "card.generate", card=type(self).__name__, batch=self.batch_no
+        ) as span:
+            self.prepare(post_time)
+            cached = self.load_cached()
+            span.set(cached=cached)
+            if not cached:
+                stats = self.save_formats(self.render_formats())
+                span.set(bytes=stats.bytes)
+
+        # Show the image
+        if open_when_done:
+            self.open()
+        return self.filename
+
+    def prepare(self, post_time=None):
         self.post_time = post_time or datetime.now()
-        base = self.create_base_image()
-        draw = ImageDraw.Draw(base)
-
-        # Draw border
-        draw.rounded_rectangle(
-            [
-                (self.border_thickness, self.border_thickness),
-                (
-                    self.width + self.border_thickness,
-                    self.height + self.border_thickness,
-                ),
-            ],
-            radius=self.border_radius,
-            outline=self.border_color,
-            width=self.border_thickness,
+        with self.tracer.span("card.fonts"):
+            self.load_fonts()
+
+    def format_filename(self, name):
+        if name == "feed":
+            return self.filename
+        root, extension = os.path.splitext(self.filename)
+        return f"{root}_{name}{extension}"
+
+    @property
+    def output_formats(self):
+        return ["feed", *(name for name in self.formats if name != "feed")]
+
+    def load_cached(self):
+        """
+        Copy cached renders of every format into place. Returns False if any
+        of them is missing.
+        """
+        cache = self.render_cache
+        return bool(cache) and all(
+            cache.get(self.fingerprint_for(name), self.format_filename(name))
+            for name in self.output_formats
         )
 
-        self.load_fonts()
+    def save(self, image):
+        """Encode a rendered image to self.filename, returning EncodeStats"""
+        return self.save_formats({"feed": image})
 
-        # Prepare an overlay for transparency
-        overlay = Image.new("RGBA", base.size, (0, 0, 0, 0))
-        overlay_draw = ImageDraw.Draw(overlay)
+    def save_formats(self, images):
+        """
+        Encode the image of each format to its filename. Returns the feed
+        image's EncodeStats.
+        """
+        feed_stats = None
+        for name, image in images.items():
+            filename = self.format_filename(name)
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            stats = self.encoder.save(image, filename)
+            if self.render_cache:
+                self.render_cache.put(self.fingerprint_for(name), filename)
+            if name == "feed":
+                feed_stats = stats
+        return feed_stats
 
-        # Define top message content
-        formatted_post_time = self.post_time.strftime("%A, %b %d, %Y")
-        header_lines = [
-            ("Rally4Israel Rally Roundup", self.font_title),
-            (formatted_post_time, self.font_subtitle),
-        ]
-        if self.total_batches > 1:
-            header_lines.append(
-                (f"(post {self.batch_no}/{self.total_batches})", self.font_subtitle)
-            )
+    @property
+    def compiled_layout(self):
+        return self.compile(self.layout)
 
-        # Calculate header dimensions
-        line_heights = [
-            self.get_font_size(font, text)[1] for text, font in header_lines
-        ]
-        total_header_height = sum(line_heights) + (len(header_lines) - 1) * 10
-        rect_padding = 20
-        rect_width = self.width - 2 * self.padding
-        rect_height = total_header_height + 2 * rect_padding
-
-        # Draw rounded rectangle for the top message
-        rect_x1 = (base.width - rect_width) // 2
-        rect_y1 = self.padding
-        rect_x2 = rect_x1 + rect_width
-        rect_y2 = rect_y1 + rect_height
-        rect_color = self.header_footer_background
-        overlay_draw.rounded_rectangle(
-            [(rect_x1, rect_y1), (rect_x2, rect_y2)],
-            radius=20,
-            fill=rect_color,
-        )
+    def compile(self, layout):
+        return compile_layout(layout, tuple(self.layout_fonts.items()))
 
-        # Composite the overlay onto the base image
-        base = Image.alpha_composite(base.convert("RGBA"), overlay)
-
-        # Add text to the top message
-        draw = ImageDraw.Draw(
-            base
-        )  # Reinitialize the draw object for the updated image
-        y_offset = rect_y1 + rect_padding
-        for text, font in header_lines:
-            text_width, text_height = self.get_font_size(font, text)
-            x_position = rect_x1 + (rect_width - text_width) // 2
-            draw.text((x_position, y_offset), text, font=font, fill="black")
-            y_offset += text_height + 10
-
-        # Prepare content
-        y_position = 350
-
-        # Draw content
-        descriptive_texts = [
-            (
-                "🪧",
-                "Listing rallies for Israel, the Jewish community, and the hostages' release",
-            ),
-            ("🔗", "Full calendar at rally4israel.com/calendar (link in bio)"),
-            ("👉", "Send us your rally info to get featured!"),
-        ]
-        with Pilmoji(base, source=TwemojiEmojiSource) as pilmoji:
-            y_position += 30
-            for emoji, text in descriptive_texts:
-                y_position = self.draw_icon_and_text(
-                    pilmoji, emoji, text, y_position, self.font_subtitle
+    def render(self):
+        """
+        Render the feed card. "card.text_emoji" is the body text and emojis
+        drawn through pilmoji.
+        """
+        with self.tracer.span("card.layout"):
+            card = self.compiled_layout
+            values = self.values
+        with self.tracer.span("card.compositing"):
+            base = self.render_template()
+        with self.tracer.span("card.text_emoji"):
+            with Pilmoji(base, source=TwemojiEmojiSource) as pilmoji:
+                card.draw_body(pilmoji, values)
+        with self.tracer.span("card.compositing"):
+            card.footer.draw(base)
+        return base
+
+    def render_formats(self):
+        """Images by format name, starting with the feed card"""
+        feed = self.render()
+        images = {"feed": feed}
+        for name in self.output_formats[1:]:
+            card_format = CARD_FORMATS[name]
+            if card_format.size:
+                images[name] = feed.resize(
+                    card_format.size, Image.Resampling.LANCZOS, reducing_gap=3.0
                 )
-                y_position += 40
-
-        """Draw a bottom message with the Instagram logo."""
-        message = "Follow @rally4israel for more updates"
-        font = self.font_subtitle
-        # Load Instagram logo
-        logo_size = 50
-        logo_path = "img/icons/instagram_logo.png"
-        instagram_logo = (
-            Image.open(logo_path).resize((logo_size, logo_size)).convert("RGBA")
+            else:
+                images[name] = self.reframe(feed, card_format.height)
+        return images
+
+    def reframe(self, feed, height):
+        layout = replace(self.layout, height=height)
+        card = self.compile(layout)
+        header_lines = self.header_lines
+        frame = cached_template(
+            self.template_key_for(layout), lambda: card.render_frame(header_lines)
         )
-        # Calculate positions
-        text_width, text_height = self.get_font_size(font, message)
-        # Calculate positions for bottom message
-        total_width = logo_size + 10 + text_width  # Logo + spacing + text
-        x_position = (base.width - total_width) // 2  # Center the group (logo + text)
-        y_position = self.height - self.padding - text_height + 10  # Adjust padding
-        # Define rounded rectangle properties
-        rect_padding = 20
-        rect_x1 = x_position - rect_padding
-        rect_y1 = y_position - rect_padding + 5
-        rect_x2 = x_position + total_width + rect_padding
-        rect_y2 = y_position + text_height + rect_padding
-        rect_color = self.header_footer_background
-        # Create a temporary overlay for semi-transparency
-        overlay = Image.new("RGBA", base.size, (0, 0, 0, 0))
-        overlay_draw = ImageDraw.Draw(overlay)
-        overlay_draw.rounded_rectangle(
-            [(rect_x1, rect_y1), (rect_x2, rect_y2)],
-            radius=15,
-            fill=rect_color,
+        return card.reframe(self.compiled_layout, feed, frame, header_lines)
+
+    @property
+    def template_key(self):
+        return self.template_key_for(self.layout)
+
+    def template_key_for(self, layout):
+        return (
+            type(self),
+            layout,
+            tuple((text, font_key(font)) for text, font in self.header_lines),
         )
-        base = Image.alpha_composite(base.convert("RGBA"), overlay)
-        # Paste Instagram logo
-        base.paste(instagram_logo, (x_position, y_position), mask=instagram_logo)
-        # Draw text next to the logo
-        draw = ImageDraw.Draw(base)
-        text_x = x_position + logo_size + 15  # Position text after the logo
-        draw.text((text_x, y_position - 10), message, font=font, fill="black")
-        # Convert the final image to RGB mode (to save as JPEG)
-        base = base.convert("RGB")
-
-        # Save image
-        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
-        base.save(self.filename)
 
-        # Show the image
-        if open_when_done:
-            self.open()
+    @property
+    def fingerprint(self):
+        return self.fingerprint_for("feed")
+
+    def fingerprint_for(self, name):
+        parts = [
+            type(self).__qualname__,
+            self.template_version,
+            self.layout,
+            self.render_key,
+            [(text, font_fingerprint(font)) for text, font in self.header_lines],
+            [font_fingerprint(font) for font in self.layout_fonts.values()],
+            self.encoder.options,
+        ]
+        if name != "feed":
+            parts.append([name, CARD_FORMATS[name]])
+        return render_fingerprint(*parts)
+
+    def render_template(self):
+        """
+        The parts of the image shared by every card with the same header
+        (canvas, border and header), rendered once and copied
+        """
+        return cached_template(self.template_key, self._render_template)
+
+    def _render_template(self):
+        return self.compiled_layout.render_frame(self.header_lines)
+
+    @property
+    @abstractmethod
+    def header_lines(self):
+        """(text, font) pairs for the header panel"""
 
+    @property
+    @abstractmethod
+    def layout_fonts(self):
+        """Fonts by the names used in the layout"""
+
+    @property
+    def values(self):
+        """Values for the layout's text templates"""
+        return {}
+
+    @property
+    def render_key(self):
+        """Everything besides the header that changes what the card shows"""
+        return self.values
+
+    @abstractmethod
     def load_fonts(self):
-        try:
-            font_dir = os.path.join(os.path.dirname(__file__), "../fonts")
-            self.font_title = ImageFont.truetype(
-                os.path.join(font_dir, "NotoSans-Bold.ttf"), 65
-            )
-            self.font_subtitle = ImageFont.truetype(
-                os.path.join(font_dir, "NotoSans-Regular.ttf"), 50
-            )
-        except OSError:
-            print("Font not found, using default font.")
-            self.font_title = self.font_subtitle = ImageFont.load_default()
+        """Load the fonts used by header_lines and layout_fonts"""
 
     def open(self):
         """
@@ -238,249 +270,158 @@ class IntroImageGenerator:
             subprocess.run(["xdg-open", self.filename])
 
 
-class EventImageGenerator:
-    padding = 60
+class IntroImageGenerator(CardImageGenerator):
+    layout = CardLayout(
+        body_top=380,
+        body=(
+            IconRow(
+                "🪧",
+                "Listing rallies for Israel, the Jewish community, and the hostages' release",
+                "subtitle",
+                text_offset=-10,
+            ),
+            Spacer(40),
+            IconRow(
+                "🔗",
+                "Full calendar at rally4israel.com/calendar (link in bio)",
+                "subtitle",
+                text_offset=-10,
+            ),
+            Spacer(40),
+            IconRow(
+                "👉",
+                "Send us your rally info to get featured!",
+                "subtitle",
+                text_offset=-10,
+            ),
+        ),
+        footer=Footer(
+            "Follow @rally4israel for more updates",
+            "subtitle",
+            text_gap=15,
+            text_offset=-10,
+        ),
+    )
 
     def __init__(
         self,
-        event: Event,
-        filename="event_image.jpg",
+        filename="intro_image.jpg",
         batch_no=1,
+        total_batches=1,
         base_path="img/instagram/",
     ):
-        self.base_path = base_path
-        self.event = event
-        self.batch_no = batch_no
-        self.filename = f"{self.base_path}batches/{self.batch_no}/{filename}"
-        self.width = self.height = 1080
-        self.border_thickness = 15
-        self.border_radius = 30
-        self.background_color = (0, 92, 144)  # Blue
-        self.border_color = (0, 0, 0)  # Black
-        self.header_footer_background = (232, 232, 232, 200)
+        super().__init__(filename, batch_no=batch_no, base_path=base_path)
+        self.total_batches = total_batches
 
     @property
-    def formatted_date(self):
-        return self.event.date.strftime("%A, %b %d")
+    def header_lines(self):
+        formatted_post_time = self.post_time.strftime("%A, %b %d, %Y")
+        header_lines = [
+            ("Rally4Israel Rally Roundup", self.font_title),
+            (formatted_post_time, self.font_subtitle),
+        ]
+        if self.total_batches > 1:
+            header_lines.append(
+                (f"(post {self.batch_no}/{self.total_batches})", self.font_subtitle)
+            )
+        return header_lines
 
     @property
-    def formatted_start_time(self):
-        try:
-            return self.event.start_time.strftime("%-I:%M %p").lower()
-        except AttributeError as e:
-            print(e)
-            print("Failed on: ", self.event)
-
-    def create_base_image(self):
-        return Image.new(
-            "RGB",
-            (
-                self.width + 2 * self.border_thickness,
-                self.height + 2 * self.border_thickness,
-            ),
-            self.background_color,
-        )
+    def render_key(self):
+        return [self.batch_no, self.total_batches]
 
-    def wrap_text(self, text, max_chars=40):
-        return textwrap.wrap(text, width=max_chars)
+    @property
+    def layout_fonts(self):
+        return {"title": self.font_title, "subtitle": self.font_subtitle}
 
-    def get_font_size(self, font, text):
+    def load_fonts(self):
         try:
-            return font.getsize(text)
-        except AttributeError:
-            left, top, right, bottom = font.getbbox(text)
-            tw, th = right - left, bottom - top
-            return tw, th
-
-    def draw_icon_and_text(
-        self, pilmoji, icon, text, y_position, font, max_width=500, line_spacing=30
-    ):
-        """Draw an emoji (bullet point) and wrapped text."""
-        lines = self.wrap_text(
-            text, max_chars=max_width // self.get_font_size(self.font_details, " ")[0]
-        )
-        x_icon = self.padding
-        x_text = x_icon + 75  # Space for emoji
-        line_height = self.get_font_size(font, "A")[1] + line_spacing
-        for i, line in enumerate(lines):
-            if i == 0 and icon:
-                pilmoji.text((x_icon, y_position), icon, font=font, fill="white")
-            pilmoji.text(
-                (x_text, y_position - 7),
-                line,
-                font=font,
-                fill="white",
-            )
-            y_position += line_height
-        return y_position
+            self.font_title = load_font(font_path("NotoSans-Bold.ttf"), 65)
+            self.font_subtitle = load_font(font_path("NotoSans-Regular.ttf"), 50)
+        except OSError:
+            print("Font not found, using default font.")
+            self.font_title = self.font_subtitle = ImageFont.load_default()
 
-    def generate(self, open_when_done=False, post_time=None):
-        self.post_time = post_time or datetime.now()
-        base = self.create_base_image()
-        draw = ImageDraw.Draw(base)
-
-        # Draw border
-        draw.rounded_rectangle(
-            [
-                (self.border_thickness, self.border_thickness),
-                (
-                    self.width + self.border_thickness,
-                    self.height + self.border_thickness,
-                ),
-            ],
-            radius=self.border_radius,
-            outline=self.border_color,
-            width=self.border_thickness,
-        )
 
-        self.load_fonts()
+class EventImageGenerator(CardImageGenerator):
+    layout = CardLayout(
+        body_top=250,
+        body=(
+            # Long titles are set in a smaller font to fit in 3 lines
+            Title("{title}", "event", max_lines=3, min_font_size=36),
+            Spacer(30),
+            IconRow("🗓️", "{date}", "details", text_offset=-7),
+            IconRow("⏰", "{start_time}", "details", text_offset=-7),
+            IconRow("📌", "{location}", "details", text_offset=-7),
+        ),
+        footer=Footer(
+            "Follow @rally4israel for more updates",
+            "details",
+            text_gap=10,
+            text_offset=-7,
+        ),
+    )
 
-        # Prepare an overlay for transparency
-        overlay = Image.new("RGBA", base.size, (0, 0, 0, 0))
-        overlay_draw = ImageDraw.Draw(overlay)
+    def __init__(
+        self,
+        event: Event,
+        filename="event_image.jpg",
+        batch_no=1,
+        base_path="img/instagram/",
+    ):
+        super().__init__(filename, batch_no=batch_no, base_path=base_path)
+        self.event = event
 
-        # Define top message content
-        header_font_large = self.font_event
-        header_font_small = self.font_details
-        formatted_post_time = self.post_time.strftime("%A, %b %d, %Y")
-        header_lines = [
-            ("Rally4Israel Rally Roundup", header_font_large),
-            (formatted_post_time, header_font_small),
-        ]
+    @property
+    def formatted_date(self):
+        return self.event.date.strftime("%A, %b %d")
 
-        # Calculate header dimensions
-        line_heights = [
-            self.get_font_size(font, text)[1] for text, font in header_lines
+    @property
+    def formatted_start_time(self):
+        # None for all-day events
+        if self.event.start_time is None:
+            return None
+        return self.event.start_time.strftime("%-I:%M %p").lower()
+
+    @property
+    def header_lines(self):
+        formatted_post_time = self.post_time.strftime("%A, %b %d, %Y")
+        return [
+            ("Rally4Israel Rally Roundup", self.font_event),
+            (formatted_post_time, self.font_details),
         ]
-        total_header_height = sum(line_heights) + (len(header_lines) - 1) * 10
-        rect_padding = 20
-        rect_width = self.width - 2 * self.padding
-        rect_height = total_header_height + 2 * rect_padding
-
-        # Draw rounded rectangle for the top message
-        rect_x1 = (base.width - rect_width) // 2
-        rect_y1 = self.padding
-        rect_x2 = rect_x1 + rect_width
-        rect_y2 = rect_y1 + rect_height
-        rect_color = self.header_footer_background
-        overlay_draw.rounded_rectangle(
-            [(rect_x1, rect_y1), (rect_x2, rect_y2)],
-            radius=20,
-            fill=rect_color,
-        )
 
-        # Composite the overlay onto the base image
-        base = Image.alpha_composite(base.convert("RGBA"), overlay)
-
-        # Add text to the top message
-        draw = ImageDraw.Draw(
-            base
-        )  # Reinitialize the draw object for the updated image
-        y_offset = rect_y1 + rect_padding
-        for text, font in header_lines:
-            text_width, text_height = self.get_font_size(font, text)
-            x_position = (self.width - text_width) // 2  # Center text
-            draw.text((x_position, y_offset), text, font=font, fill="black")
-            y_offset += text_height + 10
-
-        # Prepare content
-        title_lines = self.wrap_text(self.event.title, max_chars=36)
-        y_position = 250
-
-        # Draw content
-        with Pilmoji(base, source=TwemojiEmojiSource) as pilmoji:
-            for line in title_lines:
-                pilmoji.text(
-                    (self.padding, y_position), line, font=self.font_event, fill="white"
-                )
-                y_position += self.get_font_size(self.font_event, line)[1] + 20
-            y_position += 30
-            y_position = self.draw_icon_and_text(
-                pilmoji, "🗓️", self.formatted_date, y_position, self.font_details
-            )
-            y_position = self.draw_icon_and_text(
-                pilmoji, "⏰", self.formatted_start_time, y_position, self.font_details
-            )
-            y_position = self.draw_icon_and_text(
-                pilmoji,
-                "📌",
-                self.event.location.strip(),
-                y_position,
-                self.font_details,
-            )
+    @property
+    def values(self):
+        return {
+            "title": self.event.title,
+            "date": self.formatted_date,
+            # The time row is left out for events without a start time
+            "start_time": self.formatted_start_time or "",
+            "location": self.event.location.strip(),
+        }
 
-        """Draw a bottom message with the Instagram logo."""
-        message = "Follow @rally4israel for more updates"
-        font = self.font_details
-        # Load Instagram logo
-        logo_size = 50
-        logo_path = "img/icons/instagram_logo.png"
-        instagram_logo = (
-            Image.open(logo_path).resize((logo_size, logo_size)).convert("RGBA")
-        )
-        # Calculate positions
-        text_width, text_height = self.get_font_size(font, message)
-        # Calculate positions for bottom message
-        total_width = logo_size + 10 + text_width  # Logo + spacing + text
-        x_position = (base.width - total_width) // 2  # Center the group (logo + text)
-        y_position = self.height - self.padding - text_height + 10  # Adjust padding
-        # Define rounded rectangle properties
-        rect_padding = 20
-        rect_x1 = x_position - rect_padding
-        rect_y1 = y_position - rect_padding + 5
-        rect_x2 = x_position + total_width + rect_padding
-        rect_y2 = y_position + text_height + rect_padding
-        rect_color = self.header_footer_background
-        # Create a temporary overlay for semi-transparency
-        overlay = Image.new("RGBA", base.size, (0, 0, 0, 0))
-        overlay_draw = ImageDraw.Draw(overlay)
-        overlay_draw.rounded_rectangle(
-            [(rect_x1, rect_y1), (rect_x2, rect_y2)],
-            radius=15,
-            fill=rect_color,
-        )
-        base = Image.alpha_composite(base.convert("RGBA"), overlay)
-        # Paste Instagram logo
-        base.paste(instagram_logo, (x_position, y_position), mask=instagram_logo)
-        # Draw text next to the logo
-        draw = ImageDraw.Draw(base)
-        text_x = x_position + logo_size + 10  # Position text after the logo
-        draw.text((text_x, y_position - 7), message, font=font, fill="black")
-        # Convert the final image to RGB mode (to save as JPEG)
-        base = base.convert("RGB")
-
-        # Save image
-        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
-        base.save(self.filename)
+    @property
+    def render_key(self):
+        return [
+            self.event.title,
+            self.event.date,
+            self.event.start_time,
+            self.event.location,
+        ]
 
-        # Show the image
-        if open_when_done:
-            self.open()
+    @property
+    def layout_fonts(self):
+        return {"event": self.font_event, "details": self.font_details}
 
     def load_fonts(self):
         try:
-            font_dir = os.path.join(os.path.dirname(__file__), "../fonts")
-            self.font_event = ImageFont.truetype(
-                os.path.join(font_dir, "NotoSans-Bold.ttf"), 50
-            )
-            self.font_details = ImageFont.truetype(
-                os.path.join(font_dir, "NotoSans-Regular.ttf"), 45
-            )
+            self.font_event = load_font(font_path("NotoSans-Bold.ttf"), 50)
+            self.font_details = load_font(font_path("NotoSans-Regular.ttf"), 45)
         except OSError:
             print("Font not found, using default font.")
             self.font_event = self.font_details = ImageFont.load_default()
 
-    def open(self):
-        """
-        Open the saved image based on the OS
-        """
-        if platform.system() == "Darwin":  # macOS
-            subprocess.run(["open", self.filename])
-        elif platform.system() == "Windows":  # Windows
-            subprocess.run(["start", self.filename], shell=True)
-        else:  # Linux or other Unix-like systems
-            subprocess.run(["xdg-open", self.filename])
-
 
 def generate_test_image():
     event = Event(
@@ -500,6 +441,8 @@ def generate_event_images(open_when_done=False):
         event = airtable_record_to_event(record)
         image_generator = EventImageGenerator(event, filename=f"event_image_{i}.jpg")
         image_generator.generate(open_when_done=open_when_done)
+    if RENDER_CACHE:
+        RENDER_CACHE.evict()
 
 
 if __name__ == "__main__":
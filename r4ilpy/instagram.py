@@ -1,25 +1,368 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import ExitStack
 from functools import cached_property
-from r4ilpy.airtable import AirtableCalendarViewConnector, AirtableRecordsFilterer
-from r4ilpy.events import airtable_record_to_event
+from r4ilpy.airtable import AirtableCalendarViewConnector, AirtableStreamingFilterer
+from r4ilpy.events import airtable_records_to_events
+from r4ilpy.instrumentation import TRACER
+from r4ilpy.ledger import COMPLETE, FAILED, PostingLedger
 from r4ilpy.image_generators import (
     EventImageGenerator,
     IntroImageGenerator,
     generate_event_images,
 )
-from r4ilpy.settings import INSTAGRAM_PASSWORD, INSTAGRAM_SESSION_ID, INSTAGRAM_USERNAME
+from r4ilpy.render_cache import render_fingerprint
+from r4ilpy.settings import (
+    INSTAGRAM_PASSWORD,
+    INSTAGRAM_SESSION_ID,
+    INSTAGRAM_SETTINGS_PATH,
+    INSTAGRAM_UPLOAD_WORKERS,
+    INSTAGRAM_USERNAME,
+    ENCODE_WORKERS,
+    LEDGER_PATH,
+    RENDER_WORKERS,
+)
 from instagrapi import Client
+from instagrapi.exceptions import (
+    AlbumConfigureError,
+    ChallengeRequired,
+    LoginRequired,
+    PhotoNotUpload,
+)
+from instagrapi.extractors import extract_media_v1
+from instagrapi.utils import dumps
+from pathlib import Path
+import requests
+from datetime import datetime
+import json
 import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
 from itertools import islice
 
 IMAGE_PATH = "img/testing.jpg"
 
 
+class BatchRenderError(Exception):
+    """
+    One or more images in a batch failed to render. `failures` holds
+    (filename, exception) pairs in batch order.
+    """
+
+    def __init__(self, batch_number, failures):
+        self.batch_number = batch_number
+        self.failures = failures
+        details = "; ".join(f"{filename}: {error!r}" for filename, error in failures)
+        super().__init__(f"Batch {batch_number} failed to render: {details}")
+
+
+def run_now(function, *args):
+    """Call `function` right away, returning a Future holding its outcome"""
+    future = Future()
+    try:
+        future.set_result(function(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def card_span(generator, name, parent):
+    """A span for a card stage, nested under `parent` from the batch's thread"""
+    tracer = parent.tracer if parent else generator.tracer
+    return tracer.span(
+        name, parent=parent, card=type(generator).__name__, batch=generator.batch_no
+    )
+
+
+def render_image(generator, parent=None):
+    """
+    Render stage, module-level so image generators can be sent to process
+    pools. Returns None when a cached render was reused.
+    """
+    with card_span(generator, "card.render", parent) as span:
+        cached = generator.load_cached()
+        span.set(cached=cached)
+        return None if cached else generator.render_formats()
+
+
+def encode_image(generator, render, parent=None):
+    """Encode stage: waits for the render, then writes its images"""
+    images = render.result()
+    if images is None:
+        return None
+    with card_span(generator, "card.encode", parent) as span:
+        stats = generator.save_formats(images)
+        span.set(bytes=stats.bytes, quality=stats.quality)
+        return stats
+
+
+def timed_pages(pages, span):
+    """Pass pages through, adding the time spent waiting for them to `span`"""
+    fetch_seconds = 0.0
+    page_count = records = 0
+    pages = iter(pages)
+    while True:
+        started = time.perf_counter()
+        try:
+            page = next(pages)
+        except StopIteration:
+            break
+        finally:
+            fetch_seconds += time.perf_counter() - started
+            span.set(fetch_ms=fetch_seconds * 1000, pages=page_count, records=records)
+        page_count += 1
+        records += len(page)
+        yield page
+
+
 class InstagramClient(Client):
+    # Album photos are uploaded this many at a time, each retried with
+    # exponential backoff, and the album is configured once they're all up
+    upload_workers = INSTAGRAM_UPLOAD_WORKERS
+    upload_attempts = 3
+    upload_backoff = 2.0
+    retryable_upload_errors = (PhotoNotUpload, requests.RequestException)
+    tracer = TRACER
+
+    # Settings and session saved after logging in and reused by later runs.
+    # A reused session isn't checked up front: the first request it fails
+    # (LoginRequired) logs in again and is retried.
+    settings_path = INSTAGRAM_SETTINGS_PATH
+    instagram_session_id = INSTAGRAM_SESSION_ID
+    instagram_username = INSTAGRAM_USERNAME
+    instagram_password = INSTAGRAM_PASSWORD
+
+    def __init__(self, *args, **kwargs):
+        # Album photos upload from several threads sharing this client, so
+        # one thread logs in again while the others wait
+        self._relogin_lock = threading.Lock()
+        self._relogin_thread = None
+        self._logins = 0
+        super().__init__(*args, **kwargs)
+
+    @property
+    def account(self):
+        """The configured account, saved with the settings"""
+        if self.instagram_session_id:
+            # Session IDs start with the user ID
+            return "user:" + self.instagram_session_id.split("%3A")[0]
+        return f"username:{self.instagram_username}"
+
     def login(self) -> bool:
-        if INSTAGRAM_SESSION_ID:
-            self.login_by_sessionid(INSTAGRAM_SESSION_ID)
+        if self.load_saved_settings():
+            return True
+        return self.fresh_login()
+
+    def fresh_login(self, relogin=False) -> bool:
+        if self.instagram_session_id:
+            logged_in = self.login_by_sessionid(self.instagram_session_id)
         else:
-            return super().login(INSTAGRAM_USERNAME, INSTAGRAM_PASSWORD)
+            logged_in = super().login(
+                self.instagram_username, self.instagram_password, relogin=relogin
+            )
+        self.save_settings()
+        return logged_in
+
+    def relogin(self) -> bool:
+        return self.fresh_login(relogin=True)
+
+    def relogin_once(self):
+        """
+        Log in again, unless another thread did while this one waited for
+        the lock. Returns False if this thread is already logging in.
+        """
+        if self._relogin_thread == threading.get_ident():
+            return False
+        logins = self._logins
+        with self._relogin_lock:
+            if self._logins != logins:
+                return True
+            self._relogin_thread = threading.get_ident()
+            try:
+                print("Saved Instagram session expired, logging in again")
+                self.relogin()
+                self._logins += 1
+            finally:
+                self._relogin_thread = None
+        return True
+
+    def handle_exception(self, client, e):
+        """
+        Called by instagrapi when a private request fails; the request is
+        sent again if this returns. Anything but an expired session is
+        handled as instagrapi does without this hook.
+        """
+        if not isinstance(e, LoginRequired) or not self.relogin_once():
+            self.handle_other_exception(e)
+
+    def handle_other_exception(self, e):
+        # instagrapi's private_request, when no handle_exception is set
+        if isinstance(e, ChallengeRequired) and self.with_challenge_flow:
+            self.challenge_resolve(self.last_json)
+            return
+        raise e
+
+    def load_saved_settings(self):
+        if not self.settings_path or not os.path.exists(self.settings_path):
+            return False
+        try:
+            with open(self.settings_path) as f:
+                settings = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Couldn't load Instagram settings from {self.settings_path}: {e}")
+            return False
+        if settings.pop("account", None) != self.account:
+            print("Saved Instagram settings are for another account, logging in")
+            return False
+        self.set_settings(settings)
+        if not self.user_id:
+            return False
+        # Tighten the permissions of a file created by hand
+        if os.stat(self.settings_path).st_mode & 0o077:
+            os.chmod(self.settings_path, 0o600)
+        return True
+
+    def save_settings(self):
+        """Write the settings, readable only by the owner, atomically"""
+        if not self.settings_path:
+            return
+        directory = os.path.dirname(os.path.abspath(self.settings_path))
+        os.makedirs(directory, exist_ok=True)
+        # mkstemp creates the file with mode 0o600
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({**self.get_settings(), "account": self.account}, f, indent=4)
+            os.replace(tmp_path, self.settings_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def album_upload(
+        self,
+        paths,
+        caption,
+        usertags=[],
+        location=None,
+        configure_timeout=3,
+        configure_handler=None,
+        configure_exception=None,
+        to_story=False,
+        extra_data={},
+        **kwargs,
+    ):
+        """
+        Upload a photo album, uploading the photos concurrently. Albums with
+        videos, and any of instagrapi's newer options, go through instagrapi's
+        own (sequential) album_upload.
+        """
+        paths = [Path(path) for path in paths]
+        photos_only = all(
+            path.suffix.lower() in (".jpg", ".jpeg", ".png", ".webp") for path in paths
+        )
+        if kwargs or not paths or not photos_only or self.upload_workers <= 1:
+            return super().album_upload(
+                paths,
+                caption,
+                usertags=usertags,
+                location=location,
+                configure_timeout=configure_timeout,
+                configure_handler=configure_handler,
+                configure_exception=configure_exception,
+                to_story=to_story,
+                extra_data=extra_data,
+                **kwargs,
+            )
+        children = self.upload_album_photos(paths)
+        return self.configure_album(
+            children,
+            caption,
+            usertags=usertags,
+            location=location,
+            configure_timeout=configure_timeout,
+            configure_handler=configure_handler,
+            configure_exception=configure_exception,
+            extra_data=extra_data,
+        )
+
+    def upload_album_photos(self, paths):
+        """Upload every photo, returning the album children in path order"""
+        # Distinct upload IDs, since photo_rupload's default is the current
+        # millisecond
+        first_upload_id = int(time.time() * 1000)
+        workers = min(self.upload_workers, len(paths))
+        parent = self.tracer.current()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(
+                    self.upload_album_photo, path, str(first_upload_id + i), parent
+                )
+                for i, path in enumerate(paths)
+            ]
+        return [future.result() for future in futures]
+
+    def upload_album_photo(self, path, upload_id, parent=None):
+        with self.tracer.span("photo_upload", parent=parent, photo=path.name) as span:
+            for attempt in range(self.upload_attempts):
+                span.set(attempts=attempt + 1)
+                try:
+                    upload_id, width, height = self.photo_rupload(
+                        path, upload_id=upload_id, to_album=True
+                    )
+                    break
+                except self.retryable_upload_errors as e:
+                    if attempt == self.upload_attempts - 1:
+                        raise
+                    delay = self.upload_backoff * 2**attempt
+                    print(f"Upload of {path.name} failed ({e!r}), retrying in {delay}s")
+                    time.sleep(delay)
+        return {
+            "upload_id": upload_id,
+            "edits": dumps(
+                {
+                    "crop_original_size": [width, height],
+                    "crop_center": [0.0, -0.0],
+                    "crop_zoom": 1.0,
+                }
+            ),
+            "extra": dumps({"source_width": width, "source_height": height}),
+            "scene_capture_type": "",
+            "scene_type": None,
+        }
+
+    def configure_album(
+        self,
+        children,
+        caption,
+        usertags=[],
+        location=None,
+        configure_timeout=3,
+        configure_handler=None,
+        configure_exception=None,
+        extra_data={},
+    ):
+        """Configure uploaded photos as an album, as instagrapi's album_upload does"""
+        for attempt in range(50):
+            time.sleep(configure_timeout)
+            try:
+                configured = (configure_handler or self.album_configure)(
+                    children, caption, usertags, location, extra_data=extra_data
+                )
+            except Exception as e:
+                if "Transcode not finished yet" in str(e):
+                    time.sleep(configure_timeout)
+                    continue
+                raise
+            if configured:
+                return self.extract_album_media(configured)
+        raise (configure_exception or AlbumConfigureError)(
+            response=self.last_response, **self.last_json
+        )
+
+    def extract_album_media(self, configured):
+        return extract_media_v1(configured.get("media"))
 
 
 class InstagramPoster:
@@ -28,11 +371,27 @@ class InstagramPoster:
     airtable_conn_class = AirtableCalendarViewConnector
     intro_image_generator_class = IntroImageGenerator
     event_image_generator_class = EventImageGenerator
+    # Images are rendered one after another unless this is above 1. Pillow
+    # releases the GIL for most drawing work; set a ProcessPoolExecutor for
+    # full CPU parallelism.
+    render_workers = RENDER_WORKERS
+    render_executor_class = ThreadPoolExecutor
+    # Threads encoding JPEGs while the next images render
+    encode_workers = ENCODE_WORKERS
+    # Each run renders into its own directory, removed once every batch is
+    # posted unless this is set
+    keep_run_images = False
+    tracer = TRACER
+    # Runs are recorded here, and a run that didn't complete is resumed by
+    # the next one on the same day (see r4ilpy.ledger). None to disable.
+    ledger_path = LEDGER_PATH
 
     @cached_property
     def instagram_client(self):
         client = self.instagram_client_class()
-        client.login()
+        client.tracer = self.tracer
+        with self.tracer.span("login"):
+            client.login()
         return client
 
     @property
@@ -41,14 +400,98 @@ class InstagramPoster:
 
     @property
     def intro_image_generator(self):
-        return self.intro_image_generator_class(base_path=self.base_path)
+        return self.intro_image_generator_class(base_path=self.run_path)
+
+    @cached_property
+    def ledger(self):
+        return PostingLedger(self.ledger_path) if self.ledger_path else None
+
+    @cached_property
+    def resumed_run(self):
+        """
+        Today's unfinished run from the ledger, claimed by this process so an
+        overlapping run can't resume it too
+        """
+        if not self.ledger:
+            return None
+        return self.ledger.resume_run(datetime.now().date())
+
+    @cached_property
+    def run_id(self):
+        """This run's ID in the ledger"""
+        if not self.ledger:
+            return None
+        if self.resumed_run:
+            return self.resumed_run["id"]
+        self.prune_expired_runs()
+        return self.ledger.start_run(self.post_time, self.run_path, self.batched_events)
+
+    def prune_expired_runs(self):
+        """Abandon failed runs from earlier days, which are never resumed"""
+        for run in self.ledger.expired_runs(self.post_time.date()):
+            if self.ledger.abandon_run(run["id"]):
+                print(f"Abandoned run {run['id']} from an earlier day")
+
+    @cached_property
+    def post_time(self):
+        if self.resumed_run:
+            return datetime.fromisoformat(self.resumed_run["post_time"])
+        return datetime.now()
+
+    @cached_property
+    def encode_stats(self):
+        """EncodeStats for the images encoded in each batch, by batch number"""
+        return {}
+
+    @cached_property
+    def run_path(self):
+        """Directory for this run's images, so concurrent runs don't collide"""
+        if self.resumed_run:
+            return self.resumed_run["run_path"]
+        run_id = f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}"
+        return f"{self.base_path}runs/{run_id}/"
 
     def post(self):
-        for batch_number, batch in enumerate(self.batched_events, start=1):
-            self.post_event_batch(batch_number, batch)
+        with self.tracer.span("post") as span:
+            run_id = self.run_id
+            posted = self.ledger.posted_batches(run_id) if self.ledger else set()
+            if self.resumed_run:
+                print(
+                    f"Resuming run {run_id}: {len(posted)} of "
+                    f"{self.total_event_batches} batches already posted"
+                )
+            for batch_number, batch in enumerate(self.batched_events, start=1):
+                if batch_number in posted:
+                    continue
+                try:
+                    self.post_event_batch(batch_number, batch)
+                except Exception as e:
+                    if self.ledger:
+                        self.ledger.batch_failed(run_id, batch_number, e)
+                        self.ledger.finish_run(run_id, FAILED)
+                    else:
+                        # Nothing will resume this run, so its images are
+                        # never used
+                        self.remove_run_images()
+                    raise
+            span.set(
+                batches=self.total_event_batches,
+                events=sum(len(batch) for batch in self.batched_events),
+                resumed=len(posted),
+            )
+            if self.ledger:
+                self.ledger.finish_run(run_id, COMPLETE)
+            self.remove_run_images()
+
+    def remove_run_images(self):
+        if not self.keep_run_images:
+            shutil.rmtree(self.run_path, ignore_errors=True)
 
     @cached_property
     def batched_events(self):
+        # A resumed run posts the events it started with
+        if self.resumed_run:
+            return self.ledger.run_batches(self.resumed_run["id"])
         events = self.get_events()
 
         def batched(iterable, batch_size):
@@ -60,65 +503,186 @@ class InstagramPoster:
         return list(batched_events)
 
     def get_events(self):
-        records = self.airtable_conn.fetchall()
-        filtered_records = AirtableRecordsFilterer(records).filter()
-        events = [airtable_record_to_event(record) for record in filtered_records]
-        return events
+        with self.tracer.span("get_events") as span:
+            airtable_conn = self.airtable_conn
+            pages = airtable_conn.iterate()
+            if self.tracer.enabled:
+                pages = timed_pages(pages, span)
+            filtered_records = AirtableStreamingFilterer(
+                pages, sorted_by_start=airtable_conn.sorted_by_start
+            ).filter()
+            events = airtable_records_to_events(filtered_records)
+            span.set(events=len(events))
+            return events
 
     @cached_property
     def total_event_batches(self):
         return len(self.batched_events)
 
     def post_event_batch(self, batch_number, batch):
-        self.generate_batch_images(batch_number, batch)
-        images_dir = f"{self.base_path}batches/{batch_number}/"
-        image_paths = self.get_image_paths(images_dir)
-        self.instagram_client.album_upload(
-            paths=image_paths,
-            caption="",
-            extra_data={"invite_coauthor_user_ids": []},
-        )
+        with self.tracer.span("post_event_batch", batch=batch_number):
+            image_paths = self.generate_batch_images(batch_number, batch)
+            client = self.instagram_client
+            with self.tracer.span(
+                "album_upload", batch=batch_number, images=len(image_paths)
+            ) as span:
+                if self.tracer.enabled:
+                    span.set(bytes=sum(os.path.getsize(path) for path in image_paths))
+                media = client.album_upload(
+                    paths=image_paths,
+                    caption="",
+                    extra_data={"invite_coauthor_user_ids": []},
+                )
+            if self.ledger:
+                self.ledger.batch_posted(
+                    self.run_id,
+                    batch_number,
+                    media_id=getattr(media, "id", None),
+                    media_code=getattr(media, "code", None),
+                )
 
     def generate_batch_images(self, batch_number, batch):
-        self.intro_image_generator_class(
-            batch_no=batch_number,
-            total_batches=self.total_event_batches,
-            base_path=self.base_path,
-        ).generate()
+        with self.tracer.span(
+            "generate_batch_images", batch=batch_number, events=len(batch)
+        ) as span:
+            filenames = self._generate_batch_images(batch_number, batch)
+            stats = self.encode_stats.get(batch_number, [])
+            span.set(
+                images=len(filenames),
+                encoded=len(stats),
+                bytes=sum(stat.bytes for stat in stats),
+            )
+            return filenames
+
+    def _generate_batch_images(self, batch_number, batch):
+        generators = [
+            self.intro_image_generator_class(
+                batch_no=batch_number,
+                total_batches=self.total_event_batches,
+                base_path=self.run_path,
+            )
+        ]
         for event_no, event in enumerate(batch, start=1):
             zero_padded = str(event_no).zfill(2)
-            self.event_image_generator_class(
-                event,
-                batch_no=batch_number,
-                filename=f"event_image_{zero_padded}.jpg",
-                base_path=self.base_path,
-            ).generate()
+            generators.append(
+                self.event_image_generator_class(
+                    event,
+                    batch_no=batch_number,
+                    filename=f"event_image_{zero_padded}.jpg",
+                    base_path=self.run_path,
+                )
+            )
+        if not self.ledger:
+            return self.render_images(batch_number, generators)
+
+        fingerprint = self.batch_fingerprint(generators)
+        image_paths = self.ledger.rendered_images(
+            self.run_id, batch_number, fingerprint
+        )
+        if image_paths:
+            print(f"Batch {batch_number}: reusing {len(image_paths)} rendered images")
+            return image_paths
+        filenames = self.render_images(batch_number, generators)
+        self.ledger.batch_rendered(
+            self.run_id,
+            batch_number,
+            fingerprint,
+            filenames,
+            [
+                generator.format_filename(name)
+                for generator in generators
+                for name in generator.output_formats
+            ],
+        )
+        return filenames
+
+    def batch_fingerprint(self, generators):
+        """Stable hash of how every image in a batch looks"""
+        for generator in generators:
+            generator.prepare(self.post_time)
+        return render_fingerprint(
+            *(
+                generator.fingerprint_for(name)
+                for generator in generators
+                for name in generator.output_formats
+            )
+        )
 
-    def get_image_paths(self, directory):
+    def render_images(self, batch_number, generators):
         """
-        Get a list of image file paths in the given directory.
-        Only includes .jpg, .jpeg, and .png files.
-        Ensures intro_image.jpg is first, followed by other images in alphabetical order.
+        Render every image, in parallel if render_workers > 1, and encode them
+        on a pool of encode_workers threads. Returns the filenames in
+        generator order (the batch's upload manifest), or raises
+        BatchRenderError listing every image that failed.
         """
-        valid_extensions = [".jpg", ".jpeg", ".png"]
-        image_paths = [
-            os.path.join(directory, filename)
-            for filename in os.listdir(directory)
-            if any(filename.lower().endswith(ext) for ext in valid_extensions)
-        ]
-
-        # Separate intro_image.jpg and sort the rest alphabetically
-        intro_image = [
-            path for path in image_paths if os.path.basename(path) == "intro_image.jpg"
-        ]
-        other_images = sorted(
-            [
-                path
-                for path in image_paths
-                if os.path.basename(path) != "intro_image.jpg"
+        for generator in generators:
+            generator.prepare(self.post_time)
+        # Worker threads don't see this thread's open span, so it's passed in
+        parent = self.tracer.current()
+        with ExitStack() as stack:
+            if self.render_workers > 1:
+                executor = stack.enter_context(
+                    self.render_executor_class(max_workers=self.render_workers)
+                )
+                # Spans can't be sent to other processes
+                render_parent = (
+                    parent
+                    if issubclass(self.render_executor_class, ThreadPoolExecutor)
+                    else None
+                )
+                renders = [
+                    executor.submit(render_image, generator, render_parent)
+                    for generator in generators
+                ]
+            else:
+                # Lazily, so each image starts encoding before the next renders
+                renders = (
+                    run_now(render_image, generator, parent) for generator in generators
+                )
+            if self.encode_workers > 1:
+                encoder = stack.enter_context(
+                    ThreadPoolExecutor(max_workers=self.encode_workers)
+                )
+                encode = encoder.submit
+            else:
+                encode = run_now
+            encodes = [
+                encode(encode_image, generator, render, parent)
+                for generator, render in zip(generators, renders)
             ]
+
+        filenames = []
+        failures = []
+        stats = []
+        for generator, future in zip(generators, encodes):
+            try:
+                result = future.result()
+            except Exception as e:
+                failures.append((generator.filename, e))
+                continue
+            filenames.append(generator.filename)
+            if result:
+                stats.append(result)
+        # Trim the render caches once per batch, not on every image
+        for cache in {generator.render_cache for generator in generators} - {None}:
+            cache.evict()
+        if failures:
+            raise BatchRenderError(batch_number, failures) from failures[0][1]
+        self.encode_stats[batch_number] = stats
+        self.report_encode_stats(
+            batch_number, stats, cached=len(filenames) - len(stats)
+        )
+        return filenames
+
+    def report_encode_stats(self, batch_number, stats, cached=0):
+        total_bytes = sum(stat.bytes for stat in stats)
+        encode_ms = sum(stat.seconds for stat in stats) * 1000
+        average_kb = total_bytes / len(stats) / 1024 if stats else 0
+        print(
+            f"Batch {batch_number}: encoded {len(stats)} images "
+            f"({cached} from cache), {total_bytes / 1024:.0f} KB total, "
+            f"{average_kb:.0f} KB/image, {encode_ms:.0f} ms encoding"
         )
-        return intro_image + other_images
 
 
 def main():
@@ -0,0 +1,156 @@
+"""
+Lightweight tracing for the posting pipeline.
+
+    with tracer.span("album_upload", images=20) as span:
+        ...
+        span.set(bytes=total_bytes)
+
+Each finished span is sent to the tracer's sink as a dict with its name,
+start time, duration, parent span and attributes. A tracer without a sink
+hands out a shared no-op span, so disabled tracing costs one method call.
+
+The parent is the innermost open span of the current thread. Work handed to a
+pool passes it along explicitly:
+
+    parent = tracer.current()
+    executor.submit(work, parent)  # work opens tracer.span(..., parent=parent)
+
+Set TRACE_PATH to write spans as JSON lines, and TRACE_MEMORY to add the
+tracemalloc peak (Python allocations only) to each span. tracemalloc is
+process-wide, so peaks of spans running in parallel threads overlap.
+"""
+
+from itertools import count
+import json
+import threading
+import time
+import tracemalloc
+from r4ilpy.settings import TRACE_MEMORY, TRACE_PATH
+
+
+class JsonLinesSink:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def emit(self, record):
+        line = json.dumps(record, default=str) + "\n"
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(line)
+
+
+class MemorySink:
+    """Keeps records in a list, for tests and benchmarks"""
+
+    def __init__(self):
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+    def named(self, name):
+        return [record for record in self.records if record["name"] == name]
+
+
+class NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+class Span:
+    def __init__(self, tracer, name, attrs, parent=None):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.id = next(tracer._ids)
+        self.parent = parent
+        self._child_peak = 0
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        stack = self.tracer._stack()
+        if self.parent is None and stack:
+            self.parent = stack[-1]
+        stack.append(self)
+        if self.tracer.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        self.start = time.time()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        duration = time.perf_counter() - self._started
+        self.tracer._stack().pop()
+        record = {
+            "name": self.name,
+            "id": self.id,
+            "parent": self.parent.id if self.parent else None,
+            "start": self.start,
+            "duration_ms": duration * 1000,
+            "thread": threading.current_thread().name,
+            **self.attrs,
+        }
+        if exc is not None:
+            record["error"] = repr(exc)
+        if self.tracer.trace_memory:
+            # A child span resets the peak, so fold its peak into ours
+            peak = max(tracemalloc.get_traced_memory()[1], self._child_peak)
+            if self.parent:
+                self.parent._child_peak = max(self.parent._child_peak, peak)
+            record["peak_kb"] = peak / 1024
+        self.tracer.sink.emit(record)
+        return False
+
+
+class Tracer:
+    def __init__(self, sink=None, trace_memory=False):
+        self.sink = sink
+        self.trace_memory = trace_memory
+        self._ids = count(1)
+        self._local = threading.local()
+
+    @property
+    def enabled(self):
+        return self.sink is not None
+
+    def span(self, name, parent=None, **attrs):
+        """
+        A span to use as a context manager. `parent` overrides the current
+        thread's innermost span, for spans opened in pool workers.
+        """
+        if self.sink is None:
+            return NULL_SPAN
+        return Span(
+            self, name, attrs, parent=parent if isinstance(parent, Span) else None
+        )
+
+    def current(self):
+        """The innermost open span of this thread, if any"""
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    def _stack(self):
+        try:
+            return self._local.stack
+        except AttributeError:
+            stack = self._local.stack = []
+            return stack
+
+
+TRACER = Tracer(
+    JsonLinesSink(TRACE_PATH) if TRACE_PATH else None, trace_memory=TRACE_MEMORY
+)
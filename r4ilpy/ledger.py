@@ -0,0 +1,369 @@
+"""
+SQLite ledger of posting runs, so a run that fails part way can be resumed.
+
+Each run records its batches of events, and each batch its render fingerprint,
+rendered images and the media it was posted as. Rerunning picks up today's
+unfinished run: batches already posted are skipped and images already rendered
+are uploaded as they are.
+
+A run that keeps failing can be abandoned, so the next run starts afresh from
+Airtable. Failed runs from earlier days are abandoned, and their images
+removed, when a new run starts.
+
+    poetry run python -m r4ilpy.ledger runs
+    poetry run python -m r4ilpy.ledger batches <run id>
+    poetry run python -m r4ilpy.ledger abandon <run id>
+"""
+
+import argparse
+from datetime import date as Date, datetime, time
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import uuid
+from r4ilpy.events import Event
+from r4ilpy.settings import LEDGER_PATH
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id TEXT PRIMARY KEY,
+    post_time TEXT NOT NULL,
+    run_path TEXT NOT NULL,
+    status TEXT NOT NULL,
+    host TEXT,
+    pid INTEGER,
+    started_at TEXT NOT NULL,
+    finished_at TEXT
+);
+CREATE TABLE IF NOT EXISTS batches (
+    run_id TEXT NOT NULL REFERENCES runs (id),
+    batch_number INTEGER NOT NULL,
+    events TEXT NOT NULL,
+    status TEXT NOT NULL,
+    fingerprint TEXT,
+    image_paths TEXT,
+    artifact_paths TEXT,
+    media_id TEXT,
+    media_code TEXT,
+    error TEXT,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (run_id, batch_number)
+);
+"""
+
+# Run statuses
+RUNNING = "running"
+FAILED = "failed"
+COMPLETE = "complete"
+ABANDONED = "abandoned"
+# Batch statuses
+PENDING = "pending"
+RENDERED = "rendered"
+POSTED = "posted"
+
+
+def event_to_json(event):
+    return [
+        event.title,
+        event.date.isoformat(),
+        event.start_time.isoformat() if event.start_time else None,
+        event.location,
+    ]
+
+
+def event_from_json(values):
+    title, event_date, start_time, location = values
+    return Event(
+        title=title,
+        date=Date.fromisoformat(event_date),
+        start_time=time.fromisoformat(start_time) if start_time else None,
+        location=location,
+    )
+
+
+def now():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class PostingLedger:
+    def __init__(self, path=LEDGER_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        # Lets claim_run check in SQL whether a running run's process is gone
+        self.connection.create_function(
+            "process_alive", 1, process_alive, deterministic=False
+        )
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def start_run(self, post_time, run_path, batches):
+        """Record a new run and its batches of events. Returns the run ID."""
+        run_id = f"{post_time:%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}"
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO runs "
+                "(id, post_time, run_path, status, host, pid, started_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    run_id,
+                    post_time.isoformat(),
+                    run_path,
+                    RUNNING,
+                    socket.gethostname(),
+                    os.getpid(),
+                    now(),
+                ),
+            )
+            self.connection.executemany(
+                "INSERT INTO batches (run_id, batch_number, events, status, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (
+                        run_id,
+                        batch_number,
+                        json.dumps([event_to_json(event) for event in batch]),
+                        PENDING,
+                        now(),
+                    )
+                    for batch_number, batch in enumerate(batches, start=1)
+                ],
+            )
+        return run_id
+
+    def unfinished_run(self, post_date):
+        """
+        The latest run posting on `post_date` that failed, or whose process
+        died while running, if any. A run still in progress is never
+        returned. Use resume_run() to also claim it.
+        """
+        rows = self.connection.execute(
+            "SELECT * FROM runs WHERE status IN (?, ?) "
+            "AND substr(post_time, 1, 10) = ? "
+            "ORDER BY started_at DESC, rowid DESC",
+            (FAILED, RUNNING, post_date.isoformat()),
+        )
+        for row in rows:
+            if row["status"] == FAILED or self.abandoned(row):
+                return row
+        return None
+
+    def claim_run(self, run_id):
+        """
+        Mark a failed or abandoned run as running in this process. Returns
+        False if another process claimed it first.
+        """
+        with self.connection:
+            cursor = self.connection.execute(
+                "UPDATE runs SET status = ?, host = ?, pid = ?, finished_at = NULL "
+                "WHERE id = ? AND (status = ? OR (status = ? AND host = ? "
+                "AND pid IS NOT NULL AND NOT process_alive(pid)))",
+                (
+                    RUNNING,
+                    socket.gethostname(),
+                    os.getpid(),
+                    run_id,
+                    FAILED,
+                    RUNNING,
+                    socket.gethostname(),
+                ),
+            )
+        return cursor.rowcount == 1
+
+    def resume_run(self, post_date):
+        """Claim the run unfinished_run() finds, returning it, or None"""
+        while run := self.unfinished_run(post_date):
+            if self.claim_run(run["id"]):
+                return self.run(run["id"])
+        return None
+
+    def expired_runs(self, post_date):
+        """Failed or abandoned runs posting before `post_date`, never resumed"""
+        rows = self.connection.execute(
+            "SELECT * FROM runs WHERE status IN (?, ?) "
+            "AND substr(post_time, 1, 10) < ? ORDER BY started_at",
+            (FAILED, RUNNING, post_date.isoformat()),
+        )
+        return [row for row in rows if row["status"] == FAILED or self.abandoned(row)]
+
+    def abandon_run(self, run_id):
+        """
+        Stop a run from being resumed and remove its images. Returns False if
+        there's no such unfinished run.
+        """
+        run = self.run(run_id)
+        if not run or run["status"] in (COMPLETE, ABANDONED):
+            return False
+        with self.connection:
+            self.connection.execute(
+                "UPDATE runs SET status = ?, finished_at = ? WHERE id = ?",
+                (ABANDONED, now(), run_id),
+            )
+        shutil.rmtree(run["run_path"], ignore_errors=True)
+        return True
+
+    def run(self, run_id):
+        return self.connection.execute(
+            "SELECT * FROM runs WHERE id = ?", (run_id,)
+        ).fetchone()
+
+    def abandoned(self, run):
+        """Whether a run marked as running has no process left on this host"""
+        return (
+            run["host"] == socket.gethostname()
+            and run["pid"] is not None
+            and not process_alive(run["pid"])
+        )
+
+    def run_batches(self, run_id):
+        """A run's batches of events, in order"""
+        return [
+            [event_from_json(values) for values in json.loads(row["events"])]
+            for row in self.batches(run_id)
+        ]
+
+    def batch(self, run_id, batch_number):
+        return self.connection.execute(
+            "SELECT * FROM batches WHERE run_id = ? AND batch_number = ?",
+            (run_id, batch_number),
+        ).fetchone()
+
+    def rendered_images(self, run_id, batch_number, fingerprint):
+        """
+        The image paths of a batch rendered with this fingerprint, or None if
+        it wasn't or any of its files has gone
+        """
+        row = self.batch(run_id, batch_number)
+        if not row or row["fingerprint"] != fingerprint or not row["image_paths"]:
+            return None
+        if not all(os.path.exists(path) for path in json.loads(row["artifact_paths"])):
+            return None
+        return json.loads(row["image_paths"])
+
+    def batch_rendered(
+        self, run_id, batch_number, fingerprint, image_paths, artifact_paths
+    ):
+        self._update_batch(
+            run_id,
+            batch_number,
+            status=RENDERED,
+            fingerprint=fingerprint,
+            image_paths=json.dumps(image_paths),
+            artifact_paths=json.dumps(artifact_paths),
+            error=None,
+        )
+
+    def batch_posted(self, run_id, batch_number, media_id=None, media_code=None):
+        self._update_batch(
+            run_id,
+            batch_number,
+            status=POSTED,
+            media_id=media_id,
+            media_code=media_code,
+            error=None,
+        )
+
+    def batch_failed(self, run_id, batch_number, error):
+        # Keeps the status, so a rendered batch is still reused
+        self._update_batch(run_id, batch_number, error=repr(error))
+
+    def posted_batches(self, run_id):
+        return {
+            row["batch_number"]
+            for row in self.connection.execute(
+                "SELECT batch_number FROM batches WHERE run_id = ? AND status = ?",
+                (run_id, POSTED),
+            )
+        }
+
+    def finish_run(self, run_id, status):
+        with self.connection:
+            self.connection.execute(
+                "UPDATE runs SET status = ?, finished_at = ? WHERE id = ?",
+                (status, now(), run_id),
+            )
+
+    def runs(self, limit=20):
+        """The latest runs, newest first, with their batch counts"""
+        return self.connection.execute(
+            "SELECT runs.*, count(batches.batch_number) AS batches, "
+            "sum(batches.status = ?) AS posted "
+            "FROM runs LEFT JOIN batches ON batches.run_id = runs.id "
+            "GROUP BY runs.id ORDER BY runs.started_at DESC, runs.rowid DESC "
+            "LIMIT ?",
+            (POSTED, limit),
+        ).fetchall()
+
+    def batches(self, run_id):
+        return self.connection.execute(
+            "SELECT * FROM batches WHERE run_id = ? ORDER BY batch_number",
+            (run_id,),
+        ).fetchall()
+
+    def _update_batch(self, run_id, batch_number, **columns):
+        assignments = ", ".join(f"{column} = ?" for column in columns)
+        with self.connection:
+            self.connection.execute(
+                f"UPDATE batches SET {assignments}, updated_at = ? "
+                "WHERE run_id = ? AND batch_number = ?",
+                (*columns.values(), now(), run_id, batch_number),
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--ledger", default=LEDGER_PATH)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    runs = subparsers.add_parser("runs", help="List the latest runs")
+    runs.add_argument("--limit", type=int, default=20)
+    batches = subparsers.add_parser("batches", help="List a run's batches")
+    batches.add_argument("run_id")
+    abandon = subparsers.add_parser(
+        "abandon", help="Stop a run from being resumed and remove its images"
+    )
+    abandon.add_argument("run_id")
+    args = parser.parse_args()
+
+    ledger = PostingLedger(args.ledger)
+    if args.command == "runs":
+        for run in ledger.runs(args.limit):
+            print(
+                f"{run['id']}  {run['status']:<9} posted {run['posted'] or 0}/"
+                f"{run['batches']} batches  started {run['started_at']}"
+            )
+    elif args.command == "batches":
+        for batch in ledger.batches(args.run_id):
+            images = len(json.loads(batch["image_paths"] or "[]"))
+            events = len(json.loads(batch["events"]))
+            print(
+                f"{batch['batch_number']:>3}  {batch['status']:<8} {events} events, "
+                f"{images} images  media {batch['media_id'] or '-'}"
+                + (f"  error {batch['error']}" if batch["error"] else "")
+            )
+    elif args.command == "abandon":
+        if ledger.abandon_run(args.run_id):
+            print(f"Abandoned run {args.run_id}")
+        else:
+            print(f"No unfinished run {args.run_id}")
+    ledger.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+import threading
+import time
+from requests.adapters import HTTPAdapter
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket, implemented as a virtual schedule: each request
+    reserves the next free slot, so waiting happens outside the lock.
+    `rate=None` disables limiting.
+    """
+
+    def __init__(self, rate, burst=1, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._sleep = sleep
+        self._next_slot = clock()
+        self._lock = threading.Lock()
+
+    @property
+    def _tolerance(self):
+        return (self.burst - 1) / self.rate
+
+    def acquire(self):
+        """Wait for a token. Returns the number of seconds waited."""
+        with self._lock:
+            now = self._clock()
+            if self.rate:
+                slot = max(self._next_slot, now)
+                wait = max(0.0, slot - self._tolerance - now)
+                self._next_slot = slot + 1 / self.rate
+            else:
+                # Unlimited, but still honor a pause
+                wait = max(0.0, self._next_slot - now)
+        if wait:
+            self._sleep(wait)
+        return wait
+
+    def pause(self, seconds):
+        """Hold back every request until `seconds` from now, without a burst after"""
+        with self._lock:
+            resume_at = self._clock() + seconds
+            if self.rate:
+                resume_at += self._tolerance
+            self._next_slot = max(self._next_slot, resume_at)
+
+
+def parse_retry_after(value, now=None):
+    """Seconds to wait from a Retry-After header (delay-seconds or HTTP-date)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    now = now or datetime.now(timezone.utc)
+    return max(0.0, (retry_at - now).total_seconds())
+
+
+class RateLimitGovernor:
+    """
+    Process-wide limiter for requests to one rate-limited API.
+
+    Every request waits for a token first. A 429 pauses all requests for the
+    Retry-After delay (or an exponential backoff), lowers the rate, and the
+    request is retried. The rate then climbs back towards `rate` with each
+    success, so traffic settles just under the real limit.
+    """
+
+    throttled_status = 429
+
+    def __init__(
+        self,
+        rate=5,
+        burst=1,
+        max_retries=5,
+        backoff_factor=1.0,
+        max_backoff=30.0,
+        decrease_factor=0.8,
+        increase_step=0.05,
+        min_rate=0.5,
+        clock=time.monotonic,
+        sleep=time.sleep,
+    ):
+        self.max_rate = rate
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.decrease_factor = decrease_factor
+        self.increase_step = increase_step
+        self.min_rate = min_rate
+        self.bucket = TokenBucket(rate, burst=burst, clock=clock, sleep=sleep)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.throttled = 0
+        self.retries = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+
+    @property
+    def metrics(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "throttled": self.throttled,
+                "retries": self.retries,
+                "waits": self.waits,
+                "wait_seconds": self.wait_seconds,
+                "rate": self.bucket.rate,
+            }
+
+    def call(self, send):
+        """
+        Call `send()` (which returns a requests.Response) under the limit,
+        retrying throttled responses. The last response is returned if every
+        retry is throttled.
+        """
+        for attempt in range(self.max_retries + 1):
+            waited = self.bucket.acquire()
+            response = send()
+            self._record(
+                waited, throttled=response.status_code == self.throttled_status
+            )
+            if response.status_code != self.throttled_status:
+                self._speed_up()
+                return response
+            if attempt == self.max_retries:
+                return response
+            delay = parse_retry_after(response.headers.get("Retry-After"))
+            if delay is None:
+                delay = min(self.max_backoff, self.backoff_factor * 2**attempt)
+            self._slow_down()
+            self.bucket.pause(delay)
+            response.close()
+            with self._lock:
+                self.retries += 1
+        return response
+
+    def _record(self, waited, throttled):
+        with self._lock:
+            self.requests += 1
+            if waited:
+                self.waits += 1
+                self.wait_seconds += waited
+            if throttled:
+                self.throttled += 1
+
+    def _slow_down(self):
+        if self.max_rate:
+            with self._lock:
+                self.bucket.rate = max(
+                    self.min_rate, self.bucket.rate * self.decrease_factor
+                )
+
+    def _speed_up(self):
+        if self.max_rate and self.bucket.rate < self.max_rate:
+            with self._lock:
+                self.bucket.rate = min(
+                    self.max_rate, self.bucket.rate + self.increase_step
+                )
+
+
+class GovernedHTTPAdapter(HTTPAdapter):
+    """
+    requests adapter that sends every request through a RateLimitGovernor
+    """
+
+    def __init__(self, governor, **kwargs):
+        self.governor = governor
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        return self.governor.call(
+            lambda: super(GovernedHTTPAdapter, self).send(request, **kwargs)
+        )
@@ -0,0 +1,109 @@
+from datetime import timedelta
+from functools import lru_cache
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+
+def render_fingerprint(*parts):
+    """
+    Stable hash of everything that affects how an image looks
+    """
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+@lru_cache(maxsize=32)
+def file_fingerprint(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def font_fingerprint(font):
+    """Identifies a font by its file contents and size"""
+    path = getattr(font, "path", None)
+    if not path:
+        return "default"
+    return [file_fingerprint(path), font.size]
+
+
+class RenderCache:
+    """
+    Content-addressed on-disk store of rendered images.
+
+    Entries expire after `max_age`, and evict() removes them along with the
+    least recently used entries past `max_bytes`. It walks the whole store, so
+    call it once per batch rather than per image.
+    """
+
+    def __init__(
+        self, directory, max_bytes=200 * 1024 * 1024, max_age=timedelta(days=7)
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+
+    def path_for(self, key, extension=".jpg"):
+        return os.path.join(self.directory, key[:2], f"{key}{extension}")
+
+    def get(self, key, destination):
+        """
+        Copy the cached image for `key` to `destination`. Returns False on a
+        miss or an expired entry.
+        """
+        path = self.path_for(key, os.path.splitext(destination)[1])
+        try:
+            modified = os.path.getmtime(path)
+        except OSError:
+            return False
+        if time.time() - modified > self.max_age.total_seconds():
+            return False
+        os.makedirs(os.path.dirname(destination) or ".", exist_ok=True)
+        try:
+            shutil.copyfile(path, destination)
+            # Mark as recently used
+            os.utime(path)
+        except OSError:
+            # Evicted by another thread or process since the check above
+            return False
+        return True
+
+    def put(self, key, source):
+        path = self.path_for(key, os.path.splitext(source)[1])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        os.close(fd)
+        shutil.copyfile(source, tmp_path)
+        os.replace(tmp_path, path)
+
+    def evict(self):
+        now = time.time()
+        entries = []
+        for root, _, filenames in os.walk(self.directory):
+            for filename in filenames:
+                if filename.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if now - stat.st_mtime > self.max_age.total_seconds():
+                    self._remove(path)
+                else:
+                    entries.append((stat.st_mtime, stat.st_size, path))
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            self._remove(path)
+            total_bytes -= size
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -6,9 +6,37 @@ load_dotenv()
 INSTAGRAM_USERNAME = os.getenv("INSTAGRAM_USERNAME")
 INSTAGRAM_PASSWORD = os.getenv("INSTAGRAM_PASSWORD")
 INSTAGRAM_SESSION_ID = os.getenv("INSTAGRAM_SESSION_ID")
+# Where the client's device settings and session are kept between runs (empty
+# to log in afresh every run)
+INSTAGRAM_SETTINGS_PATH = os.getenv(
+    "INSTAGRAM_SETTINGS_PATH", ".instagram_settings.json"
+)
+INSTAGRAM_UPLOAD_WORKERS = int(os.getenv("INSTAGRAM_UPLOAD_WORKERS", "4"))
+
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "1"))
+RENDER_CACHE_DIR = os.getenv("RENDER_CACHE_DIR")
+RENDER_FORMATS = tuple(os.getenv("RENDER_FORMATS", "feed").split(","))
+ENCODE_WORKERS = int(os.getenv("ENCODE_WORKERS", "2"))
+JPEG_QUALITY = int(os.getenv("JPEG_QUALITY", "75"))
+JPEG_SUBSAMPLING = os.getenv("JPEG_SUBSAMPLING", "4:2:0")
+JPEG_PROGRESSIVE = os.getenv("JPEG_PROGRESSIVE", "true").lower() in ("1", "true", "yes")
+JPEG_OPTIMIZE = os.getenv("JPEG_OPTIMIZE", "true").lower() in ("1", "true", "yes")
+JPEG_MAX_BYTES = int(os.getenv("JPEG_MAX_BYTES", "0")) or None
+# Ledger of posting runs, used to resume a failed run (empty to disable)
+LEDGER_PATH = os.getenv("LEDGER_PATH", ".posting_ledger.sqlite3")
+TRACE_PATH = os.getenv("TRACE_PATH")
+TRACE_MEMORY = os.getenv("TRACE_MEMORY", "").lower() in ("1", "true", "yes")
+EMOJI_OFFLINE = os.getenv("EMOJI_OFFLINE", "").lower() in ("1", "true", "yes")
 
 AIRTABLE_API_KEY = os.getenv("AIRTABLE_API_KEY")
 AIRTABLE_BASE_ID = os.getenv("AIRTABLE_BASE_ID")
 AIRTABLE_EVENTS_TABLE_ID = os.getenv("AIRTABLE_EVENTS_TABLE_ID")
 AIRTABLE_USERS_TABLE_ID = os.getenv("AIRTABLE_USERS_TABLE_ID")
 AIRTABLE_CALENDAR_VIEW_NAME = os.getenv("AIRTABLE_CALENDAR_VIEW_NAME")
+AIRTABLE_SNAPSHOT_PATH = os.getenv("AIRTABLE_SNAPSHOT_PATH")
+AIRTABLE_LAST_MODIFIED_FIELD = os.getenv(
+    "AIRTABLE_LAST_MODIFIED_FIELD", "Last Modified"
+)
+AIRTABLE_ENDPOINT_URL = os.getenv("AIRTABLE_ENDPOINT_URL", "https://api.airtable.com")
+AIRTABLE_POOL_SIZE = int(os.getenv("AIRTABLE_POOL_SIZE", "10"))
+AIRTABLE_REQUESTS_PER_SECOND = float(os.getenv("AIRTABLE_REQUESTS_PER_SECOND", "5"))
@@ -0,0 +1,57 @@
+import asyncio
+from r4ilpy.airtable import AirtableConnector, fetch_concurrently, get_airtable_api
+
+
+class FakeTable:
+    def __init__(self, pages):
+        self.pages = pages
+        self.fetched_pages = 0
+
+    def iterate(self, **options):
+        for page in self.pages:
+            self.fetched_pages += 1
+            yield page
+
+
+def get_test_connector(table):
+    class TestConnector(AirtableConnector):
+        options = {}
+        _table = table
+
+    return TestConnector()
+
+
+def test_afetchall_returns_records_from_every_page():
+    table = FakeTable([[{"id": "rec1"}, {"id": "rec2"}], [{"id": "rec3"}]])
+    records = asyncio.run(get_test_connector(table).afetchall())
+
+    assert [record["id"] for record in records] == ["rec1", "rec2", "rec3"]
+
+
+def test_aiterate_prefetches_next_page():
+    table = FakeTable([[{"id": "rec1"}], [{"id": "rec2"}], [{"id": "rec3"}]])
+
+    async def first_page():
+        pages = get_test_connector(table).aiterate()
+        page = await anext(pages)
+        await asyncio.sleep(0.05)
+        await pages.aclose()
+        return page
+
+    assert asyncio.run(first_page()) == [{"id": "rec1"}]
+    assert table.fetched_pages == 2
+
+
+def test_fetch_concurrently_returns_records_per_connector():
+    events_table = FakeTable([[{"id": "event1"}]])
+    users_table = FakeTable([[{"id": "user1"}], [{"id": "user2"}]])
+    events, users = fetch_concurrently(
+        get_test_connector(events_table), get_test_connector(users_table)
+    )
+
+    assert events == [{"id": "event1"}]
+    assert users == [{"id": "user1"}, {"id": "user2"}]
+
+
+def test_connectors_share_one_api_per_key():
+    assert get_airtable_api("key") is get_airtable_api("key")
@@ -0,0 +1,39 @@
+from datetime import datetime, timedelta, timezone
+from freezegun import freeze_time
+from r4ilpy.airtable import AirtableCalendarViewConnector
+
+
+@freeze_time("2021-01-01T15:30:00Z")
+def test_formula_excludes_events_before_start_of_today():
+    options = AirtableCalendarViewConnector().options
+
+    assert options["formula"] == (
+        "NOT(IS_BEFORE({Start}, DATETIME_PARSE('2021-01-01T00:00:00.000Z')))"
+    )
+
+
+def test_formula_uses_given_start_time():
+    start_time = datetime(2022, 3, 4, 10, 0, tzinfo=timezone.utc)
+    options = AirtableCalendarViewConnector(start_time=start_time).options
+
+    assert "DATETIME_PARSE('2022-03-04T00:00:00.000Z')" in options["formula"]
+
+
+def test_formula_cuts_off_at_utc_midnight_of_start_date():
+    start_time = datetime(2022, 3, 4, 22, 0, tzinfo=timezone(timedelta(hours=-5)))
+    options = AirtableCalendarViewConnector(start_time=start_time).options
+
+    assert "DATETIME_PARSE('2022-03-04T00:00:00.000Z')" in options["formula"]
+
+
+def test_only_requests_fields_used_for_filtering_and_events():
+    options = AirtableCalendarViewConnector().options
+
+    assert set(options["fields"]) == {
+        "Title",
+        "Start",
+        "Date",
+        "Start Time",
+        "Location",
+        "Recurring Event ID",
+    }
@@ -0,0 +1,108 @@
+from freezegun import freeze_time
+from r4ilpy.airtable import AirtableConnector
+import pytest
+
+
+class FakeTable:
+    def __init__(self, records):
+        self.records = records
+        self.calls = []
+
+    def all(self, **options):
+        self.calls.append(options)
+        if "fields" in options:
+            return [{"id": record["id"], "fields": {}} for record in self.records]
+        if "RECORD_ID()" in options.get("formula", ""):
+            return [
+                record for record in self.records if record["id"] in options["formula"]
+            ]
+        if "formula" in options:
+            return [record for record in self.records if record.get("changed")]
+        return list(self.records)
+
+
+@pytest.fixture
+def get_test_connector(tmp_path):
+    def _get_test_connector(table):
+        class TestConnector(AirtableConnector):
+            base_id = "base"
+            table_id = "table"
+            options = {"view": "Calendar"}
+            snapshot_path = str(tmp_path / "snapshot.json")
+            _table = table
+
+        return TestConnector()
+
+    return _get_test_connector
+
+
+def create_record(record_id, title, changed=False):
+    return {"id": record_id, "fields": {"Title": title}, "changed": changed}
+
+
+def test_first_sync_fetches_full_view(get_test_connector):
+    table = FakeTable([create_record("rec1", "Event 1")])
+    records = get_test_connector(table).fetchall()
+
+    assert [record["id"] for record in records] == ["rec1"]
+    assert table.calls == [{"view": "Calendar"}]
+
+
+def test_later_sync_only_fetches_changed_records(get_test_connector):
+    table = FakeTable([create_record("rec1", "Event 1")])
+    with freeze_time("2024-01-01T12:00:00Z"):
+        get_test_connector(table).fetchall()
+
+    table.records = [
+        create_record("rec1", "Event 1 (updated)", changed=True),
+        create_record("rec2", "Event 2", changed=True),
+    ]
+    table.calls = []
+    records = get_test_connector(table).fetchall()
+
+    assert [record["fields"]["Title"] for record in records] == [
+        "Event 1 (updated)",
+        "Event 2",
+    ]
+    changed_formula = table.calls[0]["formula"]
+    assert "IS_AFTER({Last Modified}" in changed_formula
+    assert "DATETIME_PARSE('2024-01-01T11:59:00.000Z')" in changed_formula
+    assert table.calls[1]["fields"] == ["Last Modified"]
+
+
+def test_sync_drops_deleted_records(get_test_connector):
+    table = FakeTable(
+        [create_record("rec1", "Event 1"), create_record("rec2", "Event 2")]
+    )
+    get_test_connector(table).fetchall()
+
+    table.records = [create_record("rec2", "Event 2")]
+    records = get_test_connector(table).fetchall()
+
+    assert [record["id"] for record in records] == ["rec2"]
+
+
+def test_sync_fetches_unmodified_records_new_to_the_view(get_test_connector):
+    table = FakeTable([create_record("rec2", "Event 2")])
+    get_test_connector(table).fetchall()
+
+    # rec1 wasn't modified, but now falls inside the view's formula
+    table.records = [create_record("rec1", "Event 1"), create_record("rec2", "Event 2")]
+    table.calls = []
+    records = get_test_connector(table).fetchall()
+
+    assert [record["id"] for record in records] == ["rec1", "rec2"]
+    assert table.calls[-1]["formula"] == "OR(RECORD_ID() = 'rec1')"
+
+
+@pytest.mark.parametrize(
+    "contents",
+    ['{"key": null, "records": []}', '{"synced_at": null}', '["rec1"]', "{"],
+)
+def test_malformed_snapshot_fetches_full_view(get_test_connector, tmp_path, contents):
+    (tmp_path / "snapshot.json").write_text(contents)
+    table = FakeTable([create_record("rec1", "Event 1")])
+    records = get_test_connector(table).fetchall()
+
+    assert [record["id"] for record in records] == ["rec1"]
+    assert table.calls == [{"view": "Calendar"}]
@@ -0,0 +1,59 @@
+from datetime import datetime, timezone
+from r4ilpy.airtable import AirtableEventIndex
+
+
+def create_event(title, start, recurring_event_id=""):
+    return {
+        "fields": {
+            "Title": title,
+            "Start": start,
+            "Recurring Event ID": recurring_event_id,
+        }
+    }
+
+
+def test_sorts_records_by_start():
+    index = AirtableEventIndex(
+        [
+            create_event("Event 2", "2022-02-01T00:00:00.000Z"),
+            create_event("Event 1", "2022-01-01T00:00:00.000Z"),
+        ]
+    )
+
+    assert [record["fields"]["Title"] for record in index.records] == [
+        "Event 1",
+        "Event 2",
+    ]
+
+
+def test_upcoming_returns_records_in_window():
+    index = AirtableEventIndex(
+        [
+            create_event(f"Day {day} Event", f"2022-01-{str(day).zfill(2)}T00:00:00Z")
+            for day in range(1, 11)
+        ]
+    )
+    records = index.upcoming(
+        datetime(2022, 1, 3, tzinfo=timezone.utc),
+        until=datetime(2022, 1, 5, tzinfo=timezone.utc),
+    )
+
+    assert [record["fields"]["Title"] for record in records] == [
+        "Day 3 Event",
+        "Day 4 Event",
+        "Day 5 Event",
+    ]
+
+
+def test_upcoming_keeps_first_instance_of_recurring_event_after_start():
+    index = AirtableEventIndex(
+        [
+            create_event("Past", "2022-01-01T00:00:00Z", recurring_event_id="x"),
+            create_event("Next", "2022-01-02T00:00:00Z", recurring_event_id="x"),
+            create_event("Later", "2022-01-03T00:00:00Z", recurring_event_id="x"),
+            create_event("Other", "2022-01-04T00:00:00Z"),
+        ]
+    )
+    records = index.upcoming(datetime(2022, 1, 2, tzinfo=timezone.utc), limit=5)
+
+    assert [record["fields"]["Title"] for record in records] == ["Next", "Other"]
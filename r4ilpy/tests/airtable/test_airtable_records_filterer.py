@@ -1,3 +1,4 @@
+from datetime import datetime, timedelta, timezone
 from freezegun import freeze_time
 from r4ilpy.airtable import AirtableRecordsFilterer
 
@@ -102,3 +103,19 @@ def test_includes_up_to_min_events_count_if_fewer_than_min_in_next_10_days():
 
     assert len(filtered_records) == 3
     assert filtered_records[-1]["fields"]["Title"] == "Day 12 Event"
+
+
+def test_compares_start_dates_when_start_time_is_not_utc():
+    # 23:30 on Jan 1 in New York is already Jan 2 in UTC
+    start_time = datetime(2024, 1, 1, 23, 30, tzinfo=timezone(timedelta(hours=-5)))
+    records = [
+        create_event(title="Earlier UTC Day", start="2023-12-31T23:00:00.000Z"),
+        create_event(title="Same UTC Day", start="2024-01-01T02:00:00.000Z"),
+        create_event(title="Next UTC Day", start="2024-01-02T01:00:00.000Z"),
+    ]
+    filtered_records = AirtableRecordsFilterer(records).filter(start_time=start_time)
+
+    assert [record["fields"]["Title"] for record in filtered_records] == [
+        "Same UTC Day",
+        "Next UTC Day",
+    ]
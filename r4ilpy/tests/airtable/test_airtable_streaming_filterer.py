@@ -0,0 +1,58 @@
+from freezegun import freeze_time
+from r4ilpy.airtable import AirtableRecordsFilterer, AirtableStreamingFilterer
+
+
+def create_event(title, day, recurring_event_id=""):
+    return {
+        "fields": {
+            "Title": title,
+            "Start": f"2021-01-{str(day).zfill(2)}T00:00:00Z",
+            "Recurring Event ID": recurring_event_id,
+        }
+    }
+
+
+def paginate(records, page_size=2):
+    pages = [records[i : i + page_size] for i in range(0, len(records), page_size)]
+    fetched_pages = []
+
+    def _pages():
+        for page in pages:
+            fetched_pages.append(page)
+            yield page
+
+    return _pages(), fetched_pages
+
+
+@freeze_time("2021-01-01")
+def test_stops_fetching_sorted_pages_once_window_and_fallback_are_covered():
+    records = [create_event(f"Day {day} Event", day) for day in range(1, 31)]
+    pages, fetched_pages = paginate(records)
+    filtered_records = AirtableStreamingFilterer(
+        pages, min_events=3, sorted_by_start=True
+    ).filter()
+
+    assert len(filtered_records) == 11
+    assert len(fetched_pages) == 6
+
+
+@freeze_time("2021-01-01")
+def test_matches_records_filterer_for_unsorted_pages():
+    records = [
+        create_event("Series Later", 20, recurring_event_id="x"),
+        create_event("Day 15 Event", 15),
+        create_event("Day 3 Event", 3),
+        create_event("Series First", 12, recurring_event_id="x"),
+        create_event("Day 14 Event", 14),
+        create_event("Day 13 Event", 13),
+    ]
+    pages, _ = paginate(records)
+    filtered_records = AirtableStreamingFilterer(pages, min_events=3).filter()
+
+    assert filtered_records == AirtableRecordsFilterer(records, min_events=3).filter()
+    assert [record["fields"]["Title"] for record in filtered_records] == [
+        "Day 3 Event",
+        "Series First",
+        "Day 13 Event",
+        "Day 14 Event",
+    ]
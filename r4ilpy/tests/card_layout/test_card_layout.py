@@ -0,0 +1,96 @@
+from datetime import date, datetime
+from PIL import Image, ImageChops, ImageDraw
+from r4ilpy.card_layout import (
+    CardLayout,
+    Footer,
+    IconRow,
+    Title,
+    compile_layout,
+    composite_region,
+    rounded_rectangle_layer,
+)
+from r4ilpy.events import Event
+from r4ilpy.fonts import font_path, load_font
+from r4ilpy.image_generators import CardImageGenerator, EventImageGenerator
+
+
+class RecordingPilmoji:
+    def __init__(self):
+        self.texts = []
+
+    def text(self, position, text, **kwargs):
+        self.texts.append((position, text))
+
+
+def get_fonts():
+    return (("body", load_font(font_path("NotoSans-Regular.ttf"), 45)),)
+
+
+def test_compiles_each_layout_once():
+    layout = CardLayout(
+        body=(IconRow("📌", "{where}", "body"),), footer=Footer("Hi", "body")
+    )
+
+    assert compile_layout(layout, get_fonts()) is compile_layout(layout, get_fonts())
+
+
+def test_replays_body_with_card_values():
+    layout = CardLayout(
+        body_top=100,
+        body=(
+            Title("{name}", "body"),
+            IconRow("⏰", "{when}", "body"),
+            IconRow("📌", "{where}", "body"),
+        ),
+        footer=Footer("Hi", "body"),
+    )
+    pilmoji = RecordingPilmoji()
+    compile_layout(layout, get_fonts()).draw_body(
+        pilmoji, {"name": "Rally", "when": "", "where": "Somewhere"}
+    )
+
+    assert [text for _, text in pilmoji.texts] == ["Rally", "📌", "Somewhere"]
+    assert pilmoji.texts[0][0] == (60, 100)
+
+
+def test_new_card_types_only_need_a_layout_and_fonts(tmp_path):
+    class NoticeImageGenerator(CardImageGenerator):
+        layout = CardLayout(
+            body=(IconRow("📌", "{notice}", "body"),), footer=Footer("Bye", "body")
+        )
+        header_lines = property(lambda self: [("Notice", self.font)])
+        layout_fonts = property(lambda self: {"body": self.font})
+        values = property(lambda self: {"notice": "No rallies this week"})
+
+        def load_fonts(self):
+            self.font = load_font(font_path("NotoSans-Regular.ttf"), 45)
+
+    filename = NoticeImageGenerator(
+        "notice.jpg", base_path=str(tmp_path) + "/"
+    ).generate(post_time=datetime(2024, 1, 1, 9, 0))
+
+    assert (tmp_path / "batches/1/notice.jpg").is_file()
+    assert filename.endswith("batches/1/notice.jpg")
+
+
+def test_event_without_start_time_skips_time_row(tmp_path):
+    event = Event("Test Event", date(2024, 1, 1), None, "Somewhere")
+    generator = EventImageGenerator(event, base_path=str(tmp_path) + "/")
+
+    generator.generate()
+
+    assert (tmp_path / "batches/1/event_image.jpg").is_file()
+
+
+def test_region_compositing_matches_full_frame_overlay():
+    rect = ((40, 30), (260, 120))
+    fill = (232, 232, 232, 200)
+    base = Image.new("RGB", (300, 200), (0, 92, 144))
+    overlay = Image.new("RGBA", base.size, (0, 0, 0, 0))
+    ImageDraw.Draw(overlay).rounded_rectangle(rect, radius=20, fill=fill)
+    expected = Image.alpha_composite(base.convert("RGBA"), overlay).convert("RGB")
+
+    composite_region(base, *rounded_rectangle_layer(rect, 20, fill))
+
+    assert base.mode == "RGB"
+    assert ImageChops.difference(base, expected).getbbox() is None
@@ -0,0 +1,38 @@
+from r4ilpy.emoji_atlas import EmojiAtlas, build_atlas
+from r4ilpy.emoji_sources import TwemojiEmojiSource
+import pytest
+
+
+@pytest.fixture
+def emoji_folder(tmp_path):
+    folder = tmp_path / "twemoji"
+    folder.mkdir()
+    (folder / "1f4cc.png").write_bytes(b"pushpin")
+    (folder / "23f0.png").write_bytes(b"alarm clock")
+    return str(folder)
+
+
+def test_atlas_round_trips_emoji_files(emoji_folder):
+    atlas = EmojiAtlas(build_atlas(emoji_folder))
+
+    assert len(atlas) == 2
+    assert atlas.get("1f4cc.png") == b"pushpin"
+    assert atlas.get("23f0.png") == b"alarm clock"
+    assert atlas.get("1f389.png") is None
+    atlas.close()
+
+
+def test_source_reads_from_atlas_instead_of_folder(emoji_folder, tmp_path):
+    build_atlas(emoji_folder)
+    source = TwemojiEmojiSource(emoji_folder)
+    (tmp_path / "twemoji" / "23f0.png").unlink()
+
+    assert source.get_emoji("⏰").read() == b"alarm clock"
+
+
+def test_rejects_files_that_are_not_atlases(tmp_path):
+    path = tmp_path / "not.atlas"
+    path.write_bytes(b"\x89PNG\r\n\x1a\n" + bytes(8))
+
+    with pytest.raises(ValueError):
+        EmojiAtlas(str(path))
@@ -0,0 +1,66 @@
+from io import BytesIO
+from pilmoji.source import TwitterEmojiSource
+from r4ilpy.emoji_sources import (
+    EMOJI_CACHE_SIZE,
+    TwemojiEmojiSource,
+    emoji_to_filename,
+    load_emoji,
+)
+import pytest
+
+
+@pytest.fixture
+def emoji_folder(tmp_path):
+    (tmp_path / "1f4cc.png").write_bytes(b"pushpin")
+    return str(tmp_path)
+
+
+def test_converts_emoji_to_filename_without_variation_selector():
+    assert emoji_to_filename("🗓️") == "1f5d3.png"
+    assert emoji_to_filename("🇮🇱") == "1f1ee-1f1f1.png"
+
+
+def test_returns_emoji_from_folder(emoji_folder):
+    stream = TwemojiEmojiSource(emoji_folder).get_emoji("📌")
+
+    assert stream.read() == b"pushpin"
+
+
+def test_serves_repeated_emoji_from_memory(emoji_folder, tmp_path):
+    TwemojiEmojiSource(emoji_folder).get_emoji("📌")
+    (tmp_path / "1f4cc.png").unlink()
+    stream = TwemojiEmojiSource(emoji_folder).get_emoji("📌")
+
+    assert stream.read() == b"pushpin"
+
+
+def test_offline_mode_skips_network_for_missing_emoji(emoji_folder, monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("network fetch attempted")
+
+    monkeypatch.setattr(TwitterEmojiSource, "get_emoji", fail)
+    source = TwemojiEmojiSource(emoji_folder)
+    source.offline = True
+
+    assert source.get_emoji("🎉") is None
+
+
+def test_retries_emoji_whose_download_failed(emoji_folder, monkeypatch):
+    responses = [None, BytesIO(b"party popper")]
+    monkeypatch.setattr(
+        TwitterEmojiSource, "get_emoji", lambda self, emoji: responses.pop(0)
+    )
+    source = TwemojiEmojiSource(emoji_folder)
+    source.offline = False
+
+    assert source.get_emoji("🎉") is None
+    assert source.get_emoji("🎉").read() == b"party popper"
+
+
+def test_keeps_a_bounded_number_of_emojis_in_memory(emoji_folder):
+    source = TwemojiEmojiSource(emoji_folder)
+    source.offline = True
+    for codepoint in range(0x1F300, 0x1F300 + EMOJI_CACHE_SIZE + 10):
+        source.get_emoji(chr(codepoint))
+
+    assert load_emoji.cache_info().currsize <= EMOJI_CACHE_SIZE
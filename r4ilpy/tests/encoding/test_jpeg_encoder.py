@@ -0,0 +1,40 @@
+import random
+from PIL import Image
+from r4ilpy.encoding import JpegEncoder
+import pytest
+
+
+@pytest.fixture
+def image():
+    # Noise, so the file size depends strongly on quality
+    rng = random.Random(0)
+    return Image.frombytes(
+        "RGB", (200, 200), bytes(rng.randrange(256) for _ in range(200 * 200 * 3))
+    )
+
+
+def test_saves_jpeg_with_stats(image, tmp_path):
+    filename = str(tmp_path / "image.jpg")
+    stats = JpegEncoder(quality=80).save(image, filename)
+
+    with Image.open(filename) as saved:
+        assert saved.format == "JPEG"
+    assert stats.bytes == (tmp_path / "image.jpg").stat().st_size
+    assert stats.quality == 80
+    assert stats.seconds >= 0
+
+
+def test_lowers_quality_to_fit_byte_budget(image):
+    full_size = len(JpegEncoder(quality=90).encode(image)[0])
+    encoder = JpegEncoder(quality=90, max_bytes=full_size // 2)
+    data, quality = encoder.encode(image)
+
+    assert len(data) <= full_size // 2
+    assert quality < 90
+    assert len(encoder.encode_at(image, quality + 1)) > full_size // 2
+
+
+def test_falls_back_to_min_quality_when_budget_is_unreachable(image):
+    data, quality = JpegEncoder(max_bytes=100, min_quality=20).encode(image)
+
+    assert quality == 20
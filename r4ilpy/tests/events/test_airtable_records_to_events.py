@@ -0,0 +1,40 @@
+from datetime import date, time
+import pickle
+from r4ilpy.events import airtable_record_to_event, airtable_records_to_events
+
+
+def create_record(title="Test Event", start_time="9:00am", event_date="2024-01-02"):
+    fields = {"Title": title, "Location": "Somewhere", "Date": event_date}
+    if start_time:
+        fields["Start Time"] = start_time
+    return {"fields": fields}
+
+
+RECORDS = [
+    create_record(),
+    create_record(title="Evening Event", start_time="7:30PM"),
+    create_record(title="All Day Event", start_time=None, event_date="2024-01-03"),
+]
+
+
+def test_matches_single_record_conversion():
+    events = airtable_records_to_events(RECORDS)
+
+    assert events == [airtable_record_to_event(record) for record in RECORDS]
+    assert events[1].start_time == time(19, 30)
+
+
+def test_columnar_conversion_round_trips_events():
+    columns = airtable_records_to_events(RECORDS, columnar=True)
+
+    assert len(columns) == 3
+    assert list(columns) == airtable_records_to_events(RECORDS)
+    assert columns.dates[2] == date(2024, 1, 3).toordinal()
+    assert columns.start_times[2] == -1
+
+
+def test_events_are_frozen_and_picklable():
+    event = airtable_records_to_events(RECORDS)[0]
+
+    assert pickle.loads(pickle.dumps(event)) == event
+    assert not hasattr(event, "__dict__")
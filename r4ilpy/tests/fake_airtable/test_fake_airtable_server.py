@@ -0,0 +1,83 @@
+from r4ilpy.fake_airtable import FakeAirtableServer, compile_formula
+from pyairtable import Api
+from pyairtable.api.retrying import retry_strategy
+import pytest
+import requests
+
+
+def create_record(number, start):
+    return {
+        "id": f"rec{number}",
+        "createdTime": "2021-01-01T00:00:00.000Z",
+        "fields": {"Title": f"Event {number}", "Start": start, "Notes": "..."},
+    }
+
+
+RECORDS = [
+    create_record(1, "2021-01-03T00:00:00.000Z"),
+    create_record(2, "2021-01-01T00:00:00.000Z"),
+    create_record(3, "2021-01-02T00:00:00.000Z"),
+]
+
+
+@pytest.fixture
+def server():
+    with FakeAirtableServer({"tblEvents": RECORDS}, views={"Calendar": {}}) as server:
+        yield server
+
+
+def get_table(server, retry=None):
+    return Api("key", endpoint_url=server.url, retry_strategy=retry).table(
+        "appBase", "tblEvents"
+    )
+
+
+def test_paginates_with_offsets(server):
+    pages = list(get_table(server).iterate(view="Calendar", page_size=2))
+
+    assert [len(page) for page in pages] == [2, 1]
+    assert server.request_count == 2
+
+
+def test_sorts_filters_and_projects_fields(server):
+    records = get_table(server).all(
+        sort=["Start"],
+        fields=["Title"],
+        formula="IS_AFTER({Start}, DATETIME_PARSE('2021-01-01T12:00:00.000Z'))",
+    )
+
+    assert [record["fields"] for record in records] == [
+        {"Title": "Event 3"},
+        {"Title": "Event 1"},
+    ]
+
+
+def test_rejects_unknown_view(server):
+    with pytest.raises(requests.HTTPError):
+        get_table(server).all(view="Missing")
+
+
+def test_injects_rate_limit_errors_that_pyairtable_retries():
+    with FakeAirtableServer(
+        {"tblEvents": RECORDS}, requests_per_second=1, retry_after=1
+    ) as server:
+        table = get_table(server, retry=retry_strategy(backoff_factor=0.5))
+        records = table.all(page_size=1)
+
+    assert len(records) == 3
+    assert server.throttled_count > 0
+
+
+def test_formula_supports_comparisons_and_concatenation():
+    matches = compile_formula("AND({Title} & '!' = 'Event 1!', NOT({Done}))")
+
+    assert matches({"Title": "Event 1"})
+    assert not matches({"Title": "Event 1", "Done": True})
+
+
+def test_formula_supports_record_id(server):
+    records = get_table(server).all(
+        formula="OR(RECORD_ID() = 'rec1', RECORD_ID() = 'rec3')"
+    )
+
+    assert [record["id"] for record in records] == ["rec1", "rec3"]
@@ -0,0 +1,14 @@
+from r4ilpy.fonts import font_path, load_font
+import pytest
+
+
+def test_reuses_loaded_font_for_same_path_and_size():
+    path = font_path("NotoSans-Regular.ttf")
+
+    assert load_font(path, 45) is load_font(path, 45)
+    assert load_font(path, 45) is not load_font(path, 50)
+
+
+def test_raises_os_error_for_missing_font():
+    with pytest.raises(OSError):
+        load_font(font_path("Missing.ttf"), 45)
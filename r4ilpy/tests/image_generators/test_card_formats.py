@@ -0,0 +1,51 @@
+from datetime import date, datetime, time
+from PIL import Image
+from r4ilpy.card_layout import CARD_FORMATS
+from r4ilpy.events import Event
+from r4ilpy.image_generators import EventImageGenerator
+
+POST_TIME = datetime(2024, 1, 1, 9, 0)
+
+
+class MultiFormatEventImageGenerator(EventImageGenerator):
+    render_cache = None
+    formats = ("feed", "story", "thumbnail")
+
+
+def get_generator(tmp_path):
+    event = Event("Test Event 📌", date(2024, 1, 2), time(9, 0), "Somewhere")
+    return MultiFormatEventImageGenerator(event, base_path=str(tmp_path) + "/")
+
+
+def test_writes_every_format(tmp_path):
+    get_generator(tmp_path).generate(post_time=POST_TIME)
+
+    story_height = CARD_FORMATS["story"].height + 30
+    for filename, size in [
+        ("event_image.jpg", (1110, 1110)),
+        ("event_image_story.jpg", (1110, story_height)),
+        ("event_image_thumbnail.jpg", (320, 320)),
+    ]:
+        with Image.open(tmp_path / "batches/1" / filename) as image:
+            assert image.size == size
+
+
+def test_story_reuses_feed_body_pixels(tmp_path):
+    generator = get_generator(tmp_path)
+    generator.prepare(POST_TIME)
+    images = generator.render_formats()
+    feed, story = images["feed"], images["story"]
+
+    # Find the title in the story by the first row of it with text
+    title = feed.crop((0, 250, feed.width, 300))
+    first_row = next(
+        title.crop((0, y, title.width, y + 1)).tobytes()
+        for y in range(title.height)
+        if title.crop((0, y, title.width, y + 1)).getextrema()[0][1] == 255
+    )
+    story_rows = {
+        story.crop((0, y, story.width, y + 1)).tobytes(): y
+        for y in reversed(range(story.height))
+    }
+    assert first_row in story_rows
+    assert story_rows[first_row] > 250
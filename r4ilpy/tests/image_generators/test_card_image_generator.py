@@ -0,0 +1,14 @@
+from r4ilpy.image_generators import CardImageGenerator, IntroImageGenerator
+import pytest
+
+
+def test_generator_missing_a_hook_fails_when_created():
+    class IncompleteImageGenerator(CardImageGenerator):
+        layout = IntroImageGenerator.layout
+
+        @property
+        def header_lines(self):
+            return []
+
+    with pytest.raises(TypeError, match="layout_fonts"):
+        IncompleteImageGenerator("incomplete.jpg")
@@ -1,6 +1,7 @@
-from datetime import date, time
+from datetime import date, datetime, time
 from r4ilpy.events import Event
 from r4ilpy.image_generators import EventImageGenerator
+from r4ilpy.render_cache import RenderCache
 
 
 def test_saves_image_in_directory_based_on_batch_number(tmp_path):
@@ -17,3 +18,24 @@ def test_saves_image_in_directory_based_on_batch_number(tmp_path):
 
     assert expected_filepath.exists()
     assert expected_filepath.is_file()
+
+
+def test_reuses_cached_render_for_unchanged_event(tmp_path):
+    renders = []
+
+    class TestEventImageGenerator(EventImageGenerator):
+        render_cache = RenderCache(str(tmp_path / "cache"))
+
+        def render(self):
+            renders.append(self.event.title)
+            return super().render()
+
+    event = Event("Test Event", date(2024, 1, 1), time(1, 1), "Somewhere")
+    post_time = datetime(2024, 1, 1, 9, 0)
+    for batch_no in [1, 2]:
+        TestEventImageGenerator(
+            event, base_path=str(tmp_path) + "/", batch_no=batch_no
+        ).generate(post_time=post_time)
+
+    assert renders == ["Test Event"]
+    assert (tmp_path / "batches/2/event_image.jpg").is_file()
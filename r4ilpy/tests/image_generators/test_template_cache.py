@@ -0,0 +1,42 @@
+from datetime import date, datetime, time
+from r4ilpy.events import Event
+from r4ilpy.image_generators import EventImageGenerator, IntroImageGenerator
+
+
+def test_event_template_is_rendered_once_per_post_date(tmp_path):
+    renders = []
+
+    class TestEventImageGenerator(EventImageGenerator):
+        def _render_template(self):
+            renders.append(self.post_time.date())
+            return super()._render_template()
+
+    post_time = datetime(2024, 1, 1, 9, 0)
+    for title in ["Event 1", "Event 2"]:
+        event = Event(title, date(2024, 1, 2), time(9, 0), "Somewhere")
+        TestEventImageGenerator(event, base_path=str(tmp_path) + "/").generate(
+            post_time=post_time
+        )
+    event = Event("Event 3", date(2024, 1, 2), time(9, 0), "Somewhere")
+    TestEventImageGenerator(event, base_path=str(tmp_path) + "/").generate(
+        post_time=datetime(2024, 1, 2, 9, 0)
+    )
+
+    assert renders == [date(2024, 1, 1), date(2024, 1, 2)]
+
+
+def test_intro_template_depends_on_batch_label(tmp_path):
+    renders = []
+
+    class TestIntroImageGenerator(IntroImageGenerator):
+        def _render_template(self):
+            renders.append(self.batch_no)
+            return super()._render_template()
+
+    post_time = datetime(2024, 1, 1, 9, 0)
+    for batch_no in [1, 2, 1]:
+        TestIntroImageGenerator(
+            base_path=str(tmp_path) + "/", batch_no=batch_no, total_batches=2
+        ).generate(post_time=post_time)
+
+    assert renders == [1, 2]
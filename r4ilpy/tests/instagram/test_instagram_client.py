@@ -0,0 +1,243 @@
+from instagrapi.exceptions import ChallengeRequired, LoginRequired, PhotoNotUpload
+import json
+from r4ilpy.instagram import InstagramClient
+from r4ilpy.instrumentation import MemorySink, Tracer
+import threading
+import time
+import pytest
+
+
+class FakeUploadClient(InstagramClient):
+    upload_workers = 3
+    upload_backoff = 0
+
+    def __init__(self, failures=None):
+        # Skip instagrapi's setup, which builds a session
+        self.failures = dict(failures or {})
+        self.uploads = []
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+
+    def photo_rupload(self, path, upload_id="", to_album=False):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            self.uploads.append((path.name, upload_id))
+            failures = self.failures.get(path.name, 0)
+            self.failures[path.name] = failures - 1
+        time.sleep(0.02)
+        with self.lock:
+            self.active -= 1
+        if failures > 0:
+            raise PhotoNotUpload("Upload failed")
+        return upload_id, 1080, 1080
+
+    def extract_album_media(self, configured):
+        return configured
+
+
+def configure_handler(calls):
+    def handler(children, caption, usertags, location, extra_data):
+        calls.append(children)
+        return {"children": children, "caption": caption}
+
+    return handler
+
+
+def test_uploads_concurrently_and_configures_once():
+    client = FakeUploadClient()
+    calls = []
+    paths = [f"/tmp/{i}.jpg" for i in range(6)]
+
+    media = client.album_upload(
+        paths,
+        "Caption",
+        configure_timeout=0,
+        configure_handler=configure_handler(calls),
+    )
+
+    assert len(calls) == 1
+    assert media["caption"] == "Caption"
+    assert client.max_active > 1
+    assert client.max_active <= 3
+    # Children stay in path order, each with its own upload ID
+    upload_ids = [child["upload_id"] for child in media["children"]]
+    assert len(set(upload_ids)) == 6
+    assert upload_ids == sorted(upload_ids, key=int)
+    assert dict(client.uploads)["0.jpg"] == media["children"][0]["upload_id"]
+
+
+def test_photo_upload_spans_nest_under_the_album_upload():
+    client = FakeUploadClient(failures={"1.jpg": 1})
+    sink = MemorySink()
+    client.tracer = Tracer(sink)
+
+    with client.tracer.span("album_upload"):
+        client.album_upload(
+            ["/tmp/0.jpg", "/tmp/1.jpg"],
+            "Caption",
+            configure_timeout=0,
+            configure_handler=configure_handler([]),
+        )
+
+    (album_upload,) = sink.named("album_upload")
+    uploads = sorted(sink.named("photo_upload"), key=lambda span: span["photo"])
+    assert [span["parent"] for span in uploads] == [album_upload["id"]] * 2
+    assert [span["attempts"] for span in uploads] == [1, 2]
+
+
+def test_retries_failed_uploads():
+    client = FakeUploadClient(failures={"1.jpg": 2})
+    calls = []
+
+    media = client.album_upload(
+        ["/tmp/0.jpg", "/tmp/1.jpg"],
+        "Caption",
+        configure_timeout=0,
+        configure_handler=configure_handler(calls),
+    )
+
+    assert [name for name, _ in client.uploads].count("1.jpg") == 3
+    assert len(media["children"]) == 2
+    assert len(calls) == 1
+
+
+def test_gives_up_after_the_last_attempt():
+    client = FakeUploadClient(failures={"1.jpg": 3})
+    calls = []
+
+    with pytest.raises(PhotoNotUpload):
+        client.album_upload(
+            ["/tmp/0.jpg", "/tmp/1.jpg"],
+            "Caption",
+            configure_timeout=0,
+            configure_handler=configure_handler(calls),
+        )
+    assert calls == []
+
+
+class FakeLoginClient(InstagramClient):
+    instagram_session_id = None
+    instagram_username = "rally4israel"
+
+    def __init__(self, settings_path):
+        super().__init__()
+        self.settings_path = str(settings_path)
+        self.fresh_logins = 0
+
+    def login_by_sessionid(self, sessionid):
+        raise AssertionError("Not used by these tests")
+
+    def fresh_login(self, relogin=False):
+        self.fresh_logins += 1
+        self.authorization_data = {"ds_user_id": "12345", "sessionid": "12345%3Aabc"}
+        self.save_settings()
+        return True
+
+
+def test_saves_settings_readable_only_by_the_owner(tmp_path):
+    settings_path = tmp_path / "settings.json"
+    client = FakeLoginClient(settings_path)
+
+    client.login()
+
+    assert client.fresh_logins == 1
+    assert settings_path.stat().st_mode & 0o777 == 0o600
+    assert list(tmp_path.iterdir()) == [settings_path]
+
+
+def test_warm_login_reuses_saved_settings(tmp_path):
+    settings_path = tmp_path / "settings.json"
+    first = FakeLoginClient(settings_path)
+    first.login()
+
+    client = FakeLoginClient(settings_path)
+    assert client.login()
+
+    assert client.fresh_logins == 0
+    assert client.user_id == 12345
+    assert client.uuid == first.uuid
+
+
+def test_unreadable_settings_log_in_afresh(tmp_path):
+    settings_path = tmp_path / "settings.json"
+    settings_path.write_text("{not json")
+    client = FakeLoginClient(settings_path)
+
+    client.login()
+
+    assert client.fresh_logins == 1
+    assert client.user_id == 12345
+
+
+def test_expired_session_logs_in_again(tmp_path):
+    client = FakeLoginClient(tmp_path / "settings.json")
+
+    client.handle_exception(client, LoginRequired())
+
+    assert client.fresh_logins == 1
+    with pytest.raises(PhotoNotUpload):
+        client.handle_exception(client, PhotoNotUpload())
+    assert client.fresh_logins == 1
+
+
+def test_challenges_are_left_to_instagrapi(tmp_path):
+    client = FakeLoginClient(tmp_path / "settings.json")
+    challenges = []
+    client.challenge_resolve = challenges.append
+    client.last_json = {"message": "challenge_required"}
+
+    client.handle_exception(client, ChallengeRequired())
+
+    assert challenges == [{"message": "challenge_required"}]
+    assert client.fresh_logins == 0
+
+
+def test_saved_settings_for_another_account_are_not_reused(tmp_path):
+    settings_path = tmp_path / "settings.json"
+    FakeLoginClient(settings_path).login()
+
+    class OtherAccountClient(FakeLoginClient):
+        instagram_username = "someone.else"
+
+    client = OtherAccountClient(settings_path)
+    client.login()
+
+    assert client.fresh_logins == 1
+    assert json.loads(settings_path.read_text())["account"] == "username:someone.else"
+
+
+def test_threads_share_one_relogin(tmp_path):
+    class SlowLoginClient(FakeLoginClient):
+        def fresh_login(self, relogin=False):
+            time.sleep(0.05)
+            return super().fresh_login(relogin)
+
+    client = SlowLoginClient(tmp_path / "settings.json")
+    barrier = threading.Barrier(4)
+
+    def upload():
+        barrier.wait()
+        client.handle_exception(client, LoginRequired())
+
+    threads = [threading.Thread(target=upload) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert client.fresh_logins == 1
+
+
+def test_login_required_while_logging_in_is_raised(tmp_path):
+    class ExpiredLoginClient(FakeLoginClient):
+        def fresh_login(self, relogin=False):
+            self.fresh_logins += 1
+            self.handle_exception(self, LoginRequired())
+
+    client = ExpiredLoginClient(tmp_path / "settings.json")
+
+    with pytest.raises(LoginRequired):
+        client.handle_exception(client, LoginRequired())
+    assert client.fresh_logins == 1
@@ -1,6 +1,10 @@
+import os
+from types import SimpleNamespace
 from freezegun import freeze_time
 from r4ilpy.image_generators import EventImageGenerator, IntroImageGenerator
-from r4ilpy.instagram import InstagramPoster
+from r4ilpy.instagram import BatchRenderError, InstagramPoster
+from r4ilpy.instrumentation import MemorySink, Tracer
+from r4ilpy.render_cache import RenderCache
 import pytest
 
 
@@ -17,9 +21,14 @@ def get_test_poster(tmp_path):
                 self.album_uploads.append({"args": args, "kwargs": kwargs})
 
         class FakeAirtableConnector:
+            sorted_by_start = False
+
             def fetchall(self):
                 return events
 
+            def iterate(self):
+                yield events
+
         class TestIntroImageGenerator(IntroImageGenerator):
             pass
 
@@ -32,6 +41,7 @@ def get_test_poster(tmp_path):
             instagram_client_class = FakeInstagramClient
             intro_image_generator_class = TestIntroImageGenerator
             event_image_generator_class = TestEventImageGenerator
+            ledger_path = str(tmp_path / "ledger.sqlite3")
 
         return TestInstagramPoster()
 
@@ -48,6 +58,7 @@ def get_test_airtable_record(
         "fields": {
             "Title": title,
             "Location": location,
+            "Start": f"{event_date}T09:00:00.000Z",
             "Start Time": start_time,
             "Date": event_date,
         }
@@ -83,3 +94,225 @@ def test_batches_posts_with_over_19_events(get_test_poster):
     assert "event_image_01.jpg" in album_1_paths[1]
     assert "event_image_02.jpg" in album_1_paths[2]
     assert "event_image_19.jpg" in album_1_paths[19]
+
+
+@freeze_time("2024-01-01")
+def test_parallel_rendering_keeps_image_order(get_test_poster):
+    events = [get_test_airtable_record(event_date="2024-01-02")] * 5
+    poster = get_test_poster(events)
+    poster.render_workers = 3
+    poster.post()
+
+    paths = poster.instagram_client.album_uploads[-1]["kwargs"]["paths"]
+    assert "intro_image.jpg" in paths[0]
+    assert [path[-18:] for path in paths[1:]] == [
+        f"event_image_0{event_no}.jpg" for event_no in range(1, 6)
+    ]
+
+
+@freeze_time("2024-01-01")
+def test_reports_each_image_that_failed_to_render(get_test_poster):
+    events = [
+        get_test_airtable_record(event_date="2024-01-02"),
+        get_test_airtable_record(event_date="2024-01-02", location=None),
+    ]
+    poster = get_test_poster(events)
+    poster.render_workers = 2
+
+    with pytest.raises(BatchRenderError) as exc_info:
+        poster.post()
+
+    assert len(exc_info.value.failures) == 1
+    assert "event_image_02.jpg" in exc_info.value.failures[0][0]
+
+
+@freeze_time("2024-01-01")
+def test_uploads_only_images_rendered_in_this_run(get_test_poster, tmp_path):
+    stale_dir = tmp_path / "batches/1"
+    stale_dir.mkdir(parents=True)
+    (stale_dir / "event_image_99.jpg").write_bytes(b"stale")
+    poster = get_test_poster([get_test_airtable_record(event_date="2024-01-02")])
+    poster.post()
+
+    paths = poster.instagram_client.album_uploads[-1]["kwargs"]["paths"]
+    assert len(paths) == 2
+    assert all(path.startswith(poster.run_path) for path in paths)
+    assert not os.path.exists(poster.run_path)
+
+
+@freeze_time("2024-01-01")
+def test_records_encode_stats_per_batch(get_test_poster):
+    events = [get_test_airtable_record(event_date="2024-01-02")] * 3
+    poster = get_test_poster(events)
+    poster.keep_run_images = True
+    poster.post()
+
+    stats = poster.encode_stats[1]
+    assert [os.path.basename(stat.filename) for stat in stats] == [
+        "intro_image.jpg",
+        "event_image_01.jpg",
+        "event_image_02.jpg",
+        "event_image_03.jpg",
+    ]
+    assert all(stat.bytes == os.path.getsize(stat.filename) for stat in stats)
+
+
+@freeze_time("2024-01-01")
+def test_traces_each_pipeline_stage(get_test_poster):
+    sink = MemorySink()
+    events = [get_test_airtable_record(event_date="2024-01-02")] * 2
+    poster = get_test_poster(events)
+    poster.tracer = Tracer(sink)
+    poster.post()
+
+    names = {record["name"] for record in sink.records}
+    assert {
+        "post",
+        "get_events",
+        "login",
+        "post_event_batch",
+        "generate_batch_images",
+        "album_upload",
+    } <= names
+    (get_events,) = sink.named("get_events")
+    assert get_events["records"] == 2
+    assert get_events["events"] == 2
+    (upload,) = sink.named("album_upload")
+    assert upload["images"] == 3
+    assert upload["bytes"] > 0
+
+
+@freeze_time("2024-01-01")
+def test_card_spans_nest_under_their_batch_across_threads(get_test_poster):
+    sink = MemorySink()
+    events = [get_test_airtable_record(event_date="2024-01-02")] * 3
+    poster = get_test_poster(events)
+    poster.tracer = Tracer(sink)
+    poster.render_workers = 2
+    poster.post()
+
+    (batch,) = sink.named("generate_batch_images")
+    card_spans = sink.named("card.render") + sink.named("card.encode")
+    assert len(card_spans) == 8
+    assert {span["parent"] for span in card_spans} == {batch["id"]}
+
+
+@freeze_time("2024-01-01")
+def test_resumes_a_failed_run(get_test_poster):
+    events = [get_test_airtable_record(event_date="2024-01-02")] * 38
+    poster = get_test_poster(events)
+
+    class FailingInstagramClient(poster.instagram_client_class):
+        def album_upload(self, *args, **kwargs):
+            if self.album_uploads:
+                raise ConnectionError("Upload failed")
+            return super().album_upload(*args, **kwargs)
+
+    poster.instagram_client_class = FailingInstagramClient
+    with pytest.raises(ConnectionError):
+        poster.post()
+    assert len(poster.instagram_client.album_uploads) == 1
+
+    # Airtable now has no events, so these come from the ledger
+    rerun = get_test_poster([])
+
+    class MediaInstagramClient(rerun.instagram_client_class):
+        def album_upload(self, *args, **kwargs):
+            super().album_upload(*args, **kwargs)
+            return SimpleNamespace(id="123_456", code="ABC")
+
+    rerun.instagram_client_class = MediaInstagramClient
+    rerun.post()
+
+    # Only the second batch is posted, with the images rendered before
+    (upload,) = rerun.instagram_client.album_uploads
+    assert len(upload["kwargs"]["paths"]) == 20
+    assert rerun.run_id == poster.run_id
+    assert rerun.run_path == poster.run_path
+    assert rerun.encode_stats == {}
+    (run,) = rerun.ledger.runs()
+    assert (run["status"], run["posted"]) == ("complete", 2)
+    assert rerun.ledger.batches(run["id"])[1]["media_id"] == "123_456"
+    assert rerun.resumed_run is not None
+    assert get_test_poster([]).resumed_run is None
+
+
+@freeze_time("2024-01-01")
+def test_evicts_render_cache_once_per_batch(get_test_poster, tmp_path):
+    class CountingRenderCache(RenderCache):
+        evictions = 0
+
+        def evict(self):
+            self.evictions += 1
+            super().evict()
+
+    cache = CountingRenderCache(str(tmp_path / "cache"))
+    events = [get_test_airtable_record(event_date="2024-01-02")] * 3
+    poster = get_test_poster(events)
+    poster.intro_image_generator_class.render_cache = cache
+    poster.event_image_generator_class.render_cache = cache
+    poster.post()
+
+    assert cache.evictions == 1
+
+
+@freeze_time("2024-01-01")
+def test_removes_images_of_a_failed_run_without_a_ledger(get_test_poster):
+    events = [get_test_airtable_record(event_date="2024-01-02")]
+    poster = get_test_poster(events)
+    poster.ledger_path = None
+
+    class FailingInstagramClient(poster.instagram_client_class):
+        def album_upload(self, *args, **kwargs):
+            raise ConnectionError("Upload failed")
+
+    poster.instagram_client_class = FailingInstagramClient
+    with pytest.raises(ConnectionError):
+        poster.post()
+
+    assert not os.path.exists(poster.run_path)
+
+
+def test_abandoned_run_starts_afresh(get_test_poster):
+    events = [get_test_airtable_record(event_date="2024-01-02")]
+    with freeze_time("2024-01-01"):
+        poster = get_test_poster(events)
+
+        class FailingInstagramClient(poster.instagram_client_class):
+            def album_upload(self, *args, **kwargs):
+                raise ConnectionError("Upload failed")
+
+        poster.instagram_client_class = FailingInstagramClient
+        with pytest.raises(ConnectionError):
+            poster.post()
+        assert poster.ledger.abandon_run(poster.run_id)
+
+        rerun = get_test_poster(events * 2)
+        rerun.post()
+
+    assert rerun.resumed_run is None
+    assert rerun.run_id != poster.run_id
+    assert len(rerun.instagram_client.album_uploads[0]["kwargs"]["paths"]) == 3
+
+
+def test_prunes_failed_runs_from_earlier_days(get_test_poster):
+    events = [get_test_airtable_record(event_date="2024-01-05")]
+    with freeze_time("2024-01-01"):
+        poster = get_test_poster(events)
+
+        class FailingInstagramClient(poster.instagram_client_class):
+            def album_upload(self, *args, **kwargs):
+                raise ConnectionError("Upload failed")
+
+        poster.instagram_client_class = FailingInstagramClient
+        with pytest.raises(ConnectionError):
+            poster.post()
+    assert os.path.exists(poster.run_path)
+
+    with freeze_time("2024-01-02"):
+        rerun = get_test_poster(events)
+        rerun.post()
+
+    assert rerun.resumed_run is None
+    assert not os.path.exists(poster.run_path)
+    assert rerun.ledger.run(poster.run_id)["status"] == "abandoned"
@@ -0,0 +1,87 @@
+from concurrent.futures import ThreadPoolExecutor
+import json
+from r4ilpy.instrumentation import NULL_SPAN, JsonLinesSink, MemorySink, Tracer
+import pytest
+
+
+def test_disabled_tracer_hands_out_no_op_span():
+    tracer = Tracer()
+
+    assert not tracer.enabled
+    assert tracer.span("post", batches=2) is NULL_SPAN
+
+
+def test_records_nested_spans_with_attributes():
+    sink = MemorySink()
+    tracer = Tracer(sink)
+    with tracer.span("post") as outer:
+        with tracer.span("album_upload", images=3) as inner:
+            inner.set(bytes=1024)
+        outer.set(batches=1)
+
+    upload, post = sink.records
+    assert upload["name"] == "album_upload"
+    assert upload["images"] == 3
+    assert upload["bytes"] == 1024
+    assert upload["parent"] == post["id"]
+    assert post["parent"] is None
+    assert post["batches"] == 1
+    assert post["duration_ms"] >= upload["duration_ms"] >= 0
+
+
+def test_records_errors_and_reraises():
+    sink = MemorySink()
+    with pytest.raises(ValueError):
+        with Tracer(sink).span("login"):
+            raise ValueError("bad password")
+
+    assert sink.records[0]["error"] == "ValueError('bad password')"
+
+
+def test_memory_peaks_include_child_spans():
+    sink = MemorySink()
+    tracer = Tracer(sink, trace_memory=True)
+    with tracer.span("outer"):
+        with tracer.span("inner"):
+            data = bytearray(2 * 1024 * 1024)
+        del data
+
+    inner, outer = sink.records
+    assert inner["peak_kb"] >= 2048
+    assert outer["peak_kb"] >= inner["peak_kb"]
+
+
+def test_spans_in_pool_threads_nest_under_the_given_parent():
+    sink = MemorySink()
+    tracer = Tracer(sink)
+
+    def work(parent):
+        with tracer.span("work", parent=parent):
+            with tracer.span("step"):
+                pass
+
+    with tracer.span("batch"):
+        parent = tracer.current()
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            list(executor.map(work, [parent, parent]))
+
+    (batch,) = sink.named("batch")
+    works = sink.named("work")
+    assert [work["parent"] for work in works] == [batch["id"], batch["id"]]
+    assert {step["parent"] for step in sink.named("step")} == {
+        work["id"] for work in works
+    }
+    assert tracer.current() is None
+
+
+def test_writes_json_lines(tmp_path):
+    path = tmp_path / "trace.jsonl"
+    tracer = Tracer(JsonLinesSink(str(path)))
+    with tracer.span("get_events", events=5):
+        pass
+    with tracer.span("post"):
+        pass
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [record["name"] for record in records] == ["get_events", "post"]
+    assert records[0]["events"] == 5
@@ -0,0 +1,131 @@
+from datetime import date, datetime, time
+import subprocess
+import sys
+from r4ilpy.events import Event
+from r4ilpy.ledger import COMPLETE, FAILED, PostingLedger
+
+POST_TIME = datetime(2024, 1, 1, 9, 30)
+BATCHES = [
+    [
+        Event("Rally", date(2024, 1, 2), time(17, 0), "City Hall"),
+        Event("All-Day Vigil", date(2024, 1, 3), None, ""),
+    ],
+    [Event("March", date(2024, 1, 4), time(10, 0), "Main Square")],
+]
+
+
+def test_stores_batches_of_events(tmp_path):
+    ledger = PostingLedger(str(tmp_path / "ledger.sqlite3"))
+    run_id = ledger.start_run(POST_TIME, "runs/1/", BATCHES)
+
+    assert ledger.run_batches(run_id) == BATCHES
+
+
+def test_finds_the_days_unfinished_run(tmp_path):
+    ledger = PostingLedger(str(tmp_path / "ledger.sqlite3"))
+    complete = ledger.start_run(POST_TIME, "runs/1/", BATCHES)
+    ledger.finish_run(complete, COMPLETE)
+    assert ledger.unfinished_run(POST_TIME.date()) is None
+
+    failed = ledger.start_run(POST_TIME, "runs/2/", BATCHES)
+    ledger.finish_run(failed, FAILED)
+
+    run = ledger.unfinished_run(POST_TIME.date())
+    assert run["id"] == failed
+    assert run["run_path"] == "runs/2/"
+    assert ledger.unfinished_run(date(2024, 1, 2)) is None
+
+
+def test_does_not_resume_a_run_in_progress(tmp_path):
+    ledger = PostingLedger(str(tmp_path / "ledger.sqlite3"))
+    ledger.start_run(POST_TIME, "runs/1/", BATCHES)
+
+    assert ledger.unfinished_run(POST_TIME.date()) is None
+
+
+def test_resumes_a_run_whose_process_died(tmp_path):
+    ledger = PostingLedger(str(tmp_path / "ledger.sqlite3"))
+    run_id = ledger.start_run(POST_TIME, "runs/1/", BATCHES)
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    with ledger.connection:
+        ledger.connection.execute(
+            "UPDATE runs SET pid = ? WHERE id = ?", (process.pid, run_id)
+        )
+
+    assert ledger.unfinished_run(POST_TIME.date())["id"] == run_id
+    assert ledger.claim_run(run_id)
+    assert not ledger.claim_run(run_id)
+
+
+def test_only_one_ledger_resumes_a_failed_run(tmp_path):
+    path = str(tmp_path / "ledger.sqlite3")
+    ledger = PostingLedger(path)
+    run_id = ledger.start_run(POST_TIME, "runs/1/", BATCHES)
+    ledger.finish_run(run_id, FAILED)
+
+    first, second = PostingLedger(path), PostingLedger(path)
+    resumed = first.resume_run(POST_TIME.date())
+
+    assert resumed["id"] == run_id
+    assert resumed["status"] == "running"
+    assert second.resume_run(POST_TIME.date()) is None
+    assert second.unfinished_run(POST_TIME.date()) is None
+
+
+def test_abandoned_run_is_not_resumed(tmp_path):
+    ledger = PostingLedger(str(tmp_path / "ledger.sqlite3"))
+    run_path = tmp_path / "runs/1"
+    run_path.mkdir(parents=True)
+    run_id = ledger.start_run(POST_TIME, str(run_path) + "/", BATCHES)
+    ledger.finish_run(run_id, FAILED)
+
+    assert ledger.abandon_run(run_id)
+
+    assert ledger.unfinished_run(POST_TIME.date()) is None
+    assert not run_path.exists()
+    assert not ledger.abandon_run(run_id)
+
+
+def test_lists_failed_runs_from_earlier_days(tmp_path):
+    ledger = PostingLedger(str(tmp_path / "ledger.sqlite3"))
+    failed = ledger.start_run(POST_TIME, "runs/1/", BATCHES)
+    ledger.finish_run(failed, FAILED)
+    complete = ledger.start_run(POST_TIME, "runs/2/", BATCHES)
+    ledger.finish_run(complete, COMPLETE)
+    ledger.start_run(POST_TIME, "runs/3/", BATCHES)  # Still running
+
+    assert ledger.expired_runs(POST_TIME.date()) == []
+    expired = ledger.expired_runs(date(2024, 1, 2))
+    assert [run["id"] for run in expired] == [failed]
+
+
+def test_reuses_rendered_images_only_while_they_exist(tmp_path):
+    ledger = PostingLedger(str(tmp_path / "ledger.sqlite3"))
+    run_id = ledger.start_run(POST_TIME, "runs/1/", BATCHES)
+    image = tmp_path / "intro_image.jpg"
+    story = tmp_path / "intro_image_story.jpg"
+    image.write_bytes(b"jpeg")
+    story.write_bytes(b"jpeg")
+    ledger.batch_rendered(run_id, 1, "abc", [str(image)], [str(image), str(story)])
+
+    assert ledger.rendered_images(run_id, 1, "abc") == [str(image)]
+    assert ledger.rendered_images(run_id, 1, "def") is None
+    assert ledger.rendered_images(run_id, 2, "abc") is None
+    story.unlink()
+    assert ledger.rendered_images(run_id, 1, "abc") is None
+
+
+def test_keeps_history_of_posted_batches(tmp_path):
+    ledger = PostingLedger(str(tmp_path / "ledger.sqlite3"))
+    run_id = ledger.start_run(POST_TIME, "runs/1/", BATCHES)
+    ledger.batch_posted(run_id, 1, media_id="123_456", media_code="ABC")
+    ledger.batch_failed(run_id, 2, ConnectionError("Upload failed"))
+    ledger.finish_run(run_id, FAILED)
+
+    assert ledger.posted_batches(run_id) == {1}
+    (run,) = ledger.runs()
+    assert (run["status"], run["batches"], run["posted"]) == (FAILED, 2, 1)
+    first, second = ledger.batches(run_id)
+    assert first["media_id"] == "123_456"
+    assert "Upload failed" in second["error"]
@@ -0,0 +1,80 @@
+from r4ilpy.rate_limits import RateLimitGovernor, TokenBucket, parse_retry_after
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def close(self):
+        pass
+
+
+def test_token_bucket_spaces_requests_at_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(5, clock=clock, sleep=clock.sleep)
+    for _ in range(3):
+        bucket.acquire()
+
+    assert clock.sleeps == [0.2, 0.2]
+
+
+def test_token_bucket_allows_burst():
+    clock = FakeClock()
+    bucket = TokenBucket(5, burst=3, clock=clock, sleep=clock.sleep)
+    for _ in range(4):
+        bucket.acquire()
+
+    assert len(clock.sleeps) == 1
+
+
+def test_governor_retries_throttled_requests_after_retry_after():
+    clock = FakeClock()
+    governor = RateLimitGovernor(rate=5, clock=clock, sleep=clock.sleep)
+    responses = iter([FakeResponse(429, {"Retry-After": "30"}), FakeResponse(200)])
+    response = governor.call(lambda: next(responses))
+
+    assert response.status_code == 200
+    assert clock.now >= 30
+    assert governor.metrics["throttled"] == 1
+    assert governor.metrics["retries"] == 1
+    assert governor.metrics["requests"] == 2
+
+
+def test_governor_lowers_rate_after_throttling():
+    clock = FakeClock()
+    governor = RateLimitGovernor(rate=5, clock=clock, sleep=clock.sleep)
+    responses = iter([FakeResponse(429), FakeResponse(200)])
+    governor.call(lambda: next(responses))
+
+    assert governor.metrics["rate"] < 5
+
+
+def test_governor_gives_up_after_max_retries():
+    clock = FakeClock()
+    governor = RateLimitGovernor(
+        rate=None, max_retries=2, clock=clock, sleep=clock.sleep
+    )
+    response = governor.call(lambda: FakeResponse(429))
+
+    assert response.status_code == 429
+    assert governor.metrics["requests"] == 3
+    assert clock.sleeps == [1.0, 2.0]
+
+
+def test_parse_retry_after_accepts_seconds():
+    assert parse_retry_after("12") == 12.0
+    assert parse_retry_after(None) is None
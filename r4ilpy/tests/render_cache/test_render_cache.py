@@ -0,0 +1,63 @@
+from datetime import timedelta
+import os
+import time
+from r4ilpy.render_cache import RenderCache, render_fingerprint
+
+
+def write_file(path, size):
+    path.write_bytes(b"x" * size)
+    return str(path)
+
+
+def test_returns_stored_image(tmp_path):
+    cache = RenderCache(str(tmp_path / "cache"))
+    cache.put("abc123", write_file(tmp_path / "image.jpg", 10))
+    destination = tmp_path / "out" / "image.jpg"
+
+    assert cache.get("abc123", str(destination))
+    assert destination.read_bytes() == b"x" * 10
+
+
+def test_misses_unknown_key(tmp_path):
+    cache = RenderCache(str(tmp_path / "cache"))
+
+    assert not cache.get("abc123", str(tmp_path / "image.jpg"))
+
+
+def test_expires_old_entries(tmp_path):
+    cache = RenderCache(str(tmp_path / "cache"), max_age=timedelta(hours=1))
+    cache.put("abc123", write_file(tmp_path / "image.jpg", 10))
+    two_hours_ago = time.time() - 2 * 60 * 60
+    os.utime(cache.path_for("abc123"), (two_hours_ago, two_hours_ago))
+
+    assert not cache.get("abc123", str(tmp_path / "out.jpg"))
+
+
+def test_evicts_least_recently_used_entries_over_size_limit(tmp_path):
+    cache = RenderCache(str(tmp_path / "cache"), max_bytes=25)
+    cache.put("aaa", write_file(tmp_path / "a.jpg", 10))
+    os.utime(cache.path_for("aaa"), (time.time() - 60, time.time() - 60))
+    cache.put("bbb", write_file(tmp_path / "b.jpg", 10))
+    cache.put("ccc", write_file(tmp_path / "c.jpg", 10))
+    cache.evict()
+
+    assert not os.path.exists(cache.path_for("aaa"))
+    assert os.path.exists(cache.path_for("bbb"))
+    assert os.path.exists(cache.path_for("ccc"))
+
+
+def test_treats_an_entry_evicted_while_copying_as_a_miss(tmp_path, monkeypatch):
+    cache = RenderCache(str(tmp_path / "cache"))
+    cache.put("abc123", write_file(tmp_path / "image.jpg", 10))
+
+    def evicted(source, destination):
+        raise FileNotFoundError(source)
+
+    monkeypatch.setattr("r4ilpy.render_cache.shutil.copyfile", evicted)
+
+    assert not cache.get("abc123", str(tmp_path / "out.jpg"))
+
+
+def test_fingerprint_changes_with_content():
+    assert render_fingerprint("Event 1", 1) == render_fingerprint("Event 1", 1)
+    assert render_fingerprint("Event 1", 1) != render_fingerprint("Event 2", 1)
@@ -0,0 +1,49 @@
+from r4ilpy.fonts import font_path, load_font
+from r4ilpy.text_layout import fit_text, glyph_metrics, wrap_text
+import pytest
+
+
+@pytest.fixture
+def font():
+    return load_font(font_path("NotoSans-Regular.ttf"), 45)
+
+
+def test_measures_text_from_glyph_advances(font):
+    metrics = glyph_metrics(font)
+
+    assert metrics.width("Rally") == pytest.approx(font.getlength("Rally"), abs=2)
+    assert metrics.width("📌") == font.size
+
+
+def test_wraps_lines_to_pixel_width(font):
+    text = "A very long location string, " * 4
+    lines = wrap_text(text, font, max_width=400)
+
+    assert " ".join(lines) == text.strip()
+    assert len(lines) > 1
+    assert all(glyph_metrics(font).width(line) <= 400 for line in lines)
+
+
+def test_breaks_words_wider_than_a_line(font):
+    lines = wrap_text("x" * 100, font, max_width=300)
+
+    assert "".join(lines) == "x" * 100
+    assert all(glyph_metrics(font).width(line) <= 300 for line in lines)
+
+
+def test_shrinks_font_to_fit_line_limit(font):
+    text = "Very long title " * 10
+    fitted_font, lines = fit_text(text, font, max_width=960, max_lines=2, min_size=20)
+
+    assert fitted_font.size < font.size
+    assert len(lines) <= 2
+    assert len(wrap_text(text, load_font(font.path, fitted_font.size + 1), 960)) > 2
+
+
+def test_keeps_font_when_text_fits(font):
+    fitted_font, lines = fit_text(
+        "Short", font, max_width=960, max_lines=3, min_size=20
+    )
+
+    assert fitted_font is font
+    assert lines == ["Short"]
@@ -0,0 +1,119 @@
+"""
+Pixel-based text layout for the image generators.
+
+Widths come from a per-font table of glyph advances, so each character is
+measured by FreeType once per font rather than every time a line is laid out.
+Emojis are drawn by pilmoji as squares of the font size, and are measured
+that way.
+"""
+
+from functools import lru_cache
+import threading
+import emoji
+from r4ilpy.fonts import load_font
+
+# Stands in for a whole emoji (including joiners and modifiers) while measuring
+EMOJI_PLACEHOLDER = "\0"
+
+
+class GlyphMetrics:
+    """Cached advance widths and line height for one font"""
+
+    def __init__(self, font):
+        self.font = font
+        self.emoji_width = round(getattr(font, "size", 10))
+        self._advances = {EMOJI_PLACEHOLDER: self.emoji_width}
+        self._lock = threading.Lock()
+        # Heights of a capital and of a line with descenders, measured once
+        left, top, right, bottom = font.getbbox("A")
+        self.cap_height = bottom - top
+        left, top, right, bottom = font.getbbox("Ag")
+        self.line_height = bottom - top
+
+    def advance(self, char):
+        try:
+            return self._advances[char]
+        except KeyError:
+            pass
+        with self._lock:
+            width = self._advances[char] = self.font.getlength(char)
+        return width
+
+    def width(self, text):
+        if emoji.emoji_count(text):
+            text = emoji.replace_emoji(text, replace=EMOJI_PLACEHOLDER)
+        return sum(self.advance(char) for char in text)
+
+
+@lru_cache(maxsize=32)
+def glyph_metrics(font):
+    return GlyphMetrics(font)
+
+
+def wrap_text(text, font, max_width):
+    """
+    Greedily wrap `text` into lines no wider than `max_width` pixels. Words
+    that don't fit on a line of their own are broken between characters.
+    """
+    metrics = glyph_metrics(font)
+    space_width = metrics.advance(" ")
+    lines = []
+    line = []
+    line_width = 0
+    for word in text.split():
+        word_width = metrics.width(word)
+        if line and line_width + space_width + word_width <= max_width:
+            line.append(word)
+            line_width += space_width + word_width
+            continue
+        if line:
+            lines.append(" ".join(line))
+        if word_width > max_width:
+            *pieces, word = break_word(word, metrics, max_width)
+            lines.extend(pieces)
+            word_width = metrics.width(word)
+        line = [word]
+        line_width = word_width
+    if line:
+        lines.append(" ".join(line))
+    return lines
+
+
+def break_word(word, metrics, max_width):
+    pieces = []
+    piece = ""
+    piece_width = 0
+    for char in word:
+        char_width = metrics.width(char)
+        if piece and piece_width + char_width > max_width:
+            pieces.append(piece)
+            piece = ""
+            piece_width = 0
+        piece += char
+        piece_width += char_width
+    pieces.append(piece)
+    return pieces
+
+
+def fit_text(text, font, max_width, max_lines, min_size):
+    """
+    Wrap `text` in the largest size of `font` (down to `min_size`) that fits
+    in `max_lines` lines. Returns the font used and the lines. At `min_size`
+    the text may still take more lines.
+    """
+    lines = wrap_text(text, font, max_width)
+    path = getattr(font, "path", None)
+    if len(lines) <= max_lines or not path or font.size <= min_size:
+        return font, lines
+    # Binary search for the largest size that fits
+    low, high = min_size, font.size - 1
+    best = load_font(path, min_size)
+    while low <= high:
+        size = (low + high) // 2
+        candidate = load_font(path, size)
+        if len(wrap_text(text, candidate, max_width)) <= max_lines:
+            best = candidate
+            low = size + 1
+        else:
+            high = size - 1
+    return best, wrap_text(text, best, max_width)